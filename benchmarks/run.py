@@ -0,0 +1,404 @@
+"""Benchmarks of the clock generation pipeline.
+
+Run from the root of the repository:
+
+    python benchmarks/run.py                    # run all, compare with baseline
+    python benchmarks/run.py -k make_clock      # only benchmarks containing 'make_clock'
+    python benchmarks/run.py --save-baseline    # store results as new baseline
+
+Each benchmark is repeated ``--repeat`` times (expensive ones less often)
+and the median is compared with the baseline. If a benchmark got slower
+than the baseline by more than ``--tolerance`` the script exits with 1.
+The results are written as JSON, so that they can also be compared by
+other tools.
+
+Timings are only comparable on the same machine: so the baseline isn't
+part of the repository, but needs to be created locally before changing
+something.
+
+'resolve_conflicts' uses recorded clock lines (before their conflicts
+are resolved) of all pages, so that it always gets the same input.
+They are recorded at the first run to 'builds/benchmarks': remove this
+file to record them again (e.g. after changing the entries).
+"""
+
+import argparse
+import copy
+import datetime
+import json
+import os
+import pickle
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import ranges
+
+from mutwo import diary_interfaces
+from mutwo import music_parameters
+from mutwo import project_converters
+from mutwo import project_generators
+
+import main
+import project
+
+RESULT_PATH = "builds/benchmarks/results.json"
+BASELINE_PATH = "builds/benchmarks/baseline.json"
+CLOCK_LINE_PATH = "builds/benchmarks/clock-lines.pickle"
+
+# Render benchmarks use the first pages only, to keep them short.
+RENDER_PAGE_COUNT = 4
+
+# name -> (setup, repeat)
+BENCHMARK_DICT = {}
+
+
+def benchmark(name, repeat=5):
+    """Register benchmark.
+
+    The decorated function is the setup: it returns a function which is
+    timed. Setup is called before each repetition, so that it can
+    prepare fresh input (which isn't part of the timing).
+    """
+
+    def decorator(setup):
+        BENCHMARK_DICT[name] = (setup, repeat)
+        return setup
+
+    return decorator
+
+
+def get_poem_line_tuple():
+    return tuple(project.constants.POEM.split("\n"))[: project.constants.PAGE_COUNT]
+
+
+_scale_position_tuple_tuple = None
+
+
+def get_scale_position_tuple_tuple():
+    # The gatra walks are stateful: so we need to do them
+    # exactly once and in page order, like 'make_clock_tuple' does.
+    global _scale_position_tuple_tuple
+    if _scale_position_tuple_tuple is None:
+        _scale_position_tuple_tuple = tuple(
+            main.get_scale_position_tuple(poem_index, poem_line)
+            for poem_index, poem_line in enumerate(get_poem_line_tuple())
+        )
+    return _scale_position_tuple_tuple
+
+
+def _make_clock_benchmark(poem_index):
+    def setup():
+        poem_line = get_poem_line_tuple()[poem_index]
+        scale_position_tuple = get_scale_position_tuple_tuple()[poem_index]
+        return lambda: main.make_clock(
+            poem_index, poem_line, scale_position_tuple=scale_position_tuple
+        )
+
+    return setup
+
+
+for _poem_index in range(project.constants.PAGE_COUNT):
+    benchmark(f"make_clock[{_poem_index}]", repeat=1)(
+        _make_clock_benchmark(_poem_index)
+    )
+
+
+@benchmark("scale_to_gatra_walker[cold]", repeat=3)
+def _():
+    scale = project.constants.PENTATONIC_SCALE_TUPLE[0]
+
+    def run():
+        main._scale_to_gatra_walker.clear()
+        gatra_adjacency_cache, main.gatra_adjacency_cache = (
+            main.gatra_adjacency_cache,
+            None,
+        )
+        try:
+            main.scale_to_gatra_walker(scale)
+        finally:
+            main.gatra_adjacency_cache = gatra_adjacency_cache
+
+    return run
+
+
+@benchmark("scale_to_gatra_walker[disk]", repeat=3)
+def _():
+    scale = project.constants.PENTATONIC_SCALE_TUPLE[0]
+    main._scale_to_gatra_walker.clear()
+    if main.gatra_adjacency_cache is not None:
+        # Ensure the adjacency is on disk.
+        main.scale_to_gatra_walker(scale)
+
+    def run():
+        main._scale_to_gatra_walker.clear()
+        main.scale_to_gatra_walker(scale)
+
+    return run
+
+
+@benchmark("gatra_walker.walk[1000x64]", repeat=20)
+def _():
+    scale = project.constants.PENTATONIC_SCALE_TUPLE[0]
+    gatra_walker = project_converters.GatraWalker(
+        main.gatra_tuple_to_adjacency.convert(main.scale_to_gatra_tuple.convert(scale))
+    )
+    start_index_array = np.arange(1000) % len(gatra_walker)
+    return lambda: gatra_walker.get_scale_position_array(
+        gatra_walker.walk(start_index_array, 64, seed=100)
+    )
+
+
+_clock_line_list = None
+
+
+def get_clock_line_list():
+    """Clock lines of all pages before their conflicts are resolved."""
+    global _clock_line_list
+    if _clock_line_list is not None:
+        return _clock_line_list
+    try:
+        with open(CLOCK_LINE_PATH, "rb") as f:
+            _clock_line_list = pickle.load(f)
+        return _clock_line_list
+    except FileNotFoundError:
+        pass
+
+    _clock_line_list = []
+    resolve_conflicts = main.resolve_conflicts
+
+    def record(main_clock_line):
+        _clock_line_list.append(copy.deepcopy(main_clock_line))
+        resolve_conflicts(main_clock_line)
+
+    main.resolve_conflicts = record
+    try:
+        for poem_index, (poem_line, scale_position_tuple) in enumerate(
+            zip(get_poem_line_tuple(), get_scale_position_tuple_tuple())
+        ):
+            main.make_clock(
+                poem_index, poem_line, scale_position_tuple=scale_position_tuple
+            )
+    finally:
+        main.resolve_conflicts = resolve_conflicts
+
+    os.makedirs(os.path.dirname(CLOCK_LINE_PATH), exist_ok=True)
+    with open(CLOCK_LINE_PATH, "wb") as f:
+        pickle.dump(_clock_line_list, f)
+    return _clock_line_list
+
+
+@benchmark("resolve_conflicts", repeat=3)
+def _():
+    clock_line_list = copy.deepcopy(get_clock_line_list())
+
+    def run():
+        for clock_line in clock_line_list:
+            main.resolve_conflicts(clock_line)
+
+    return run
+
+
+# Arguments as they are used in the entries.
+FIND_CHORD_TUPLE_ARGUMENT_DICT = {
+    # See 'project/entries/dynamic/modal/pattern.py'
+    "glockenspiel": lambda: (
+        (project.constants.ORCHESTRATION.GLOCKENSPIEL.pitch_tuple[5],),
+        project.constants.ORCHESTRATION.GLOCKENSPIEL.pitch_tuple,
+        ranges.Range(3, 4),
+    ),
+    # See 'project/entries/dynamic/modal/alternating-scale-chords.py'
+    "harp": lambda: (
+        (
+            project.constants.PENTATONIC_SCALE_TUPLE[0]
+            .pitch_tuple[0]
+            .normalize(mutate=False),
+        ),
+        project.constants.HARP_SCALE.pitch_tuple,
+        ranges.Range(3, 4),
+    ),
+}
+
+FIND_CHORD_TUPLE_KWARGS_DICT = {
+    "glockenspiel": dict(
+        max_interval=music_parameters.JustIntonationPitch("15/8"),
+        backend="branch_and_bound",
+        top_k=1,
+    ),
+    "harp": dict(min_harmonicity=None, backend="branch_and_bound", top_k=1),
+}
+
+
+def _find_chord_tuple_benchmark(name):
+    def setup():
+        argument_tuple = FIND_CHORD_TUPLE_ARGUMENT_DICT[name]()
+        kwargs = FIND_CHORD_TUPLE_KWARGS_DICT[name]
+        return lambda: project_generators.find_chord_tuple(*argument_tuple, **kwargs)
+
+    return setup
+
+
+for _name in FIND_CHORD_TUPLE_ARGUMENT_DICT:
+    benchmark(f"find_chord_tuple[{_name}]", repeat=10)(
+        _find_chord_tuple_benchmark(_name)
+    )
+
+
+def _chord_database_benchmark(name):
+    def setup():
+        argument_tuple = FIND_CHORD_TUPLE_ARGUMENT_DICT[name]()
+        kwargs = dict(FIND_CHORD_TUPLE_KWARGS_DICT[name])
+        del kwargs["backend"], kwargs["top_k"]
+        # Build database before timing.
+        project.chords.get_chord_database(argument_tuple[1])
+        return lambda: project.chords.find_chord_tuple(*argument_tuple, **kwargs)
+
+    return setup
+
+
+for _name in FIND_CHORD_TUPLE_ARGUMENT_DICT:
+    benchmark(f"chord_database[{_name}]", repeat=10)(_chord_database_benchmark(_name))
+
+
+_render_clock_tuple_pickle = None
+
+
+def get_render_clock_tuple():
+    # Rendering mutates the clocks, so each repetition needs fresh
+    # copies of the same clocks.
+    global _render_clock_tuple_pickle
+    if _render_clock_tuple_pickle is None:
+        _render_clock_tuple_pickle = pickle.dumps(
+            tuple(
+                main.make_clock(
+                    poem_index, poem_line, scale_position_tuple=scale_position_tuple
+                )
+                for poem_index, (poem_line, scale_position_tuple) in enumerate(
+                    zip(
+                        get_poem_line_tuple()[:RENDER_PAGE_COUNT],
+                        get_scale_position_tuple_tuple(),
+                    )
+                )
+            )
+        )
+    return pickle.loads(_render_clock_tuple_pickle)
+
+
+@benchmark("midi", repeat=1)
+def _():
+    clock_tuple = get_render_clock_tuple()
+    return lambda: project.render.midi(clock_tuple)
+
+
+@benchmark("notation", repeat=1)
+def _():
+    clock_tuple = get_render_clock_tuple()
+    return lambda: project.render.notation(clock_tuple, "score")
+
+
+def run(name_filter_sequence=tuple([]), repeat=None) -> dict:
+    result_dict = {}
+    main.load_entries()
+    with diary_interfaces.open():
+        for name, (setup, benchmark_repeat) in BENCHMARK_DICT.items():
+            if name_filter_sequence and not any(
+                name_filter in name for name_filter in name_filter_sequence
+            ):
+                continue
+            time_list = []
+            for _ in range(repeat or benchmark_repeat):
+                function = setup()
+                main.seed_page(0)
+                start = time.perf_counter()
+                function()
+                time_list.append(time.perf_counter() - start)
+            result_dict[name] = dict(
+                median=statistics.median(time_list),
+                min=min(time_list),
+                time_list=time_list,
+            )
+            print(f"{name:<40} {result_dict[name]['median']:10.4f} s", flush=True)
+    return result_dict
+
+
+def compare(result_dict, baseline_dict, tolerance) -> list[str]:
+    """Print comparison with baseline and return names of regressions."""
+    regression_list = []
+    print(f"\n{'benchmark':<40} {'baseline':>10} {'now':>10} {'ratio':>7}")
+    for name, result in result_dict.items():
+        try:
+            baseline = baseline_dict[name]["median"]
+        except KeyError:
+            print(f"{name:<40} {'-':>10} {result['median']:10.4f}")
+            continue
+        ratio = result["median"] / baseline if baseline else float("inf")
+        mark = ""
+        if ratio > 1 + tolerance:
+            regression_list.append(name)
+            mark = "  <- slower"
+        print(
+            f"{name:<40} {baseline:10.4f} {result['median']:10.4f} {ratio:7.2f}{mark}"
+        )
+    return regression_list
+
+
+def get_meta_dict() -> dict:
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return dict(
+        date=datetime.datetime.now().isoformat(),
+        commit=commit,
+        python=platform.python_version(),
+        machine=platform.machine(),
+        node=platform.node(),
+    )
+
+
+def write(path, result_dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(dict(meta=get_meta_dict(), result=result_dict), f, indent=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="benchmarks")
+    parser.add_argument("-k", "--filter", action="append", default=[])
+    parser.add_argument("-r", "--repeat", type=int, default=None)
+    parser.add_argument("-o", "--output", default=RESULT_PATH)
+    parser.add_argument("-b", "--baseline", default=BASELINE_PATH)
+    parser.add_argument("-t", "--tolerance", type=float, default=0.2)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("-l", "--list", action="store_true")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(BENCHMARK_DICT))
+        sys.exit(0)
+
+    result_dict = run(args.filter, args.repeat)
+    write(args.output, result_dict)
+
+    if args.save_baseline:
+        write(args.baseline, result_dict)
+        print("saved baseline to", args.baseline)
+        sys.exit(0)
+
+    try:
+        with open(args.baseline) as f:
+            baseline_dict = json.load(f)["result"]
+    except FileNotFoundError:
+        print("no baseline found, create one with '--save-baseline'")
+        sys.exit(0)
+
+    if regression_list := compare(result_dict, baseline_dict, args.tolerance):
+        print("\nregressions:", ", ".join(regression_list))
+        sys.exit(1)
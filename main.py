@@ -1,3 +1,6 @@
+import concurrent.futures
+import random
+
 from quicktions import Fraction as f
 
 import numpy as np
@@ -11,41 +14,36 @@ from mutwo import common_generators
 from mutwo import core_events
 from mutwo import diary_converters
 from mutwo import project_converters
+from mutwo import project_generators
+from mutwo import project_utilities
 from mutwo import timeline_interfaces
 
 import project
 
 
-def make_clock(poem_index, poem_line, before_rest_duration=0) -> clock_interfaces.Clock:
+def make_clock(
+    poem_index,
+    poem_line,
+    before_rest_duration=0,
+    scale_position_tuple=None,
+    instrument_name_tuple=None,
+) -> clock_interfaces.Clock:
+    """Make clock of one page.
+
+    If ``instrument_name_tuple`` is set, only orchestrations which contain
+    any of the given instruments are converted. This is faster, but it's
+    only a preview: the other instruments would also take part in conflict
+    resolution and in the random choices of the entries.
+    """
     print("make clock for", poem_line, "...")
 
-    scale = project.constants.PENTATONIC_SCALE_TUPLE[poem_index]
-
-    match poem_index % 4:
-        case 0:
-            part_count = 2
-            energy = 61
-        case 1:
-            part_count = 3
-            energy = 51
-        case 2:
-            part_count = 2
-            energy = 41
-        case 3:
-            part_count = 1
-            energy = 51
-
-    if not poem_line:
-        scale_position_tuple = tuple((0, 0) for _ in range(part_count * 4))
-    else:
-        markov_chain = scale_to_markov_chain(scale)
-        g = markov_chain.walk_deterministic(tuple(markov_chain.keys())[0])
+    seed_page(poem_index)
 
-        scale_position_list = []
-        for _ in range(part_count):
-            scale_position_list.extend(next(g))
+    scale = project.constants.PENTATONIC_SCALE_TUPLE[poem_index]
+    part_count, energy = get_part_count_and_energy(poem_index)
 
-        scale_position_tuple = tuple(scale_position_list)
+    if scale_position_tuple is None:
+        scale_position_tuple = get_scale_position_tuple(poem_index, poem_line)
 
     root_pitch_tuple = tuple(
         scale.scale_position_to_pitch(scale_position)
@@ -88,58 +86,346 @@ def make_clock(poem_index, poem_line, before_rest_duration=0) -> clock_interface
             [core_events.SequentialEvent([core_events.SimpleEvent(1)])]
         )
 
-    main_clock_line = clock_converters.Modal0SequentialEventToClockLine(
-        (
-            diary_converters.Modal0SequentialEventToEventPlacementTuple(
-                orchestration=project.constants.ORCHESTRATION.get_subset("PCLOCK"),
-                add_mod1=True,
-            ),
-            diary_converters.Modal0SequentialEventToEventPlacementTuple(
-                orchestration=project.constants.ORCHESTRATION.get_subset(
-                    "GLOCKENSPIEL"
-                ),
-                add_mod1=True,
-            ),
-            diary_converters.Modal0SequentialEventToEventPlacementTuple(
-                orchestration=project.constants.ORCHESTRATION.get_subset("HARP"),
-                add_mod1=True,
-            ),
-            diary_converters.Modal0SequentialEventToEventPlacementTuple(
-                orchestration=project.constants.ORCHESTRATION.get_subset("V"),
-                add_mod1=True,
-            ),
-            diary_converters.Modal0SequentialEventToEventPlacementTuple(
-                orchestration=project.constants.ORCHESTRATION.get_subset("V", "HARP"),
-                add_mod1=False,
-            ),
-            diary_converters.Modal0SequentialEventToEventPlacementTuple(
-                orchestration=project.constants.ORCHESTRATION.get_subset(
-                    "GLOCKENSPIEL",
-                    "V",
-                    "HARP",
-                ),
-                add_mod1=False,
-            ),
-        )
-    ).convert(modal_sequential_event)
+    with project.profiler.stage(
+        "Modal0SequentialEventToClockLine.convert", page=poem_index
+    ):
+        main_clock_line = clock_converters.Modal0SequentialEventToClockLine(
+            tuple(
+                diary_converters.Modal0SequentialEventToEventPlacementTuple(
+                    orchestration=project.constants.ORCHESTRATION.get_subset(
+                        *instrument_key_tuple
+                    ),
+                    add_mod1=add_mod1,
+                )
+                for instrument_key_tuple, add_mod1 in ORCHESTRATION_TUPLE
+                if instrument_name_tuple is None
+                or any(
+                    getattr(project.constants.ORCHESTRATION, key).name
+                    in instrument_name_tuple
+                    for key in instrument_key_tuple
+                )
+            )
+        ).convert(modal_sequential_event)
 
     # Fix overlaps
-    main_clock_line.resolve_conflicts(
+    with project.profiler.stage("resolve_conflicts", page=poem_index):
+        resolve_conflicts(main_clock_line)
+
+    start_clock_line = (
+        _clock_rest(before_rest_duration) if before_rest_duration > 0 else None
+    )
+    end_clock_line = _clock_end(scale)
+    clock = clock_interfaces.Clock(main_clock_line, start_clock_line, end_clock_line)
+
+    return clock
+
+
+# Each orchestration (and if 'mod1' events are added) for which the
+# entries create event placements.
+ORCHESTRATION_TUPLE = (
+    (("PCLOCK",), True),
+    (("GLOCKENSPIEL",), True),
+    (("HARP",), True),
+    (("V",), True),
+    (("V", "HARP"), False),
+    (("GLOCKENSPIEL", "V", "HARP"), False),
+)
+
+
+def resolve_conflicts(main_clock_line):
+    project.timelines.resolve_conflicts(
+        main_clock_line,
         [
             TuningForkHitStrategy(),
             TagCountStrategy(),
             timeline_interfaces.AlternatingStrategy(),
         ],
         is_conflict=is_conflict,
+        # Bowed tuning forks also conflict with other percussion.
+        tag_pair_sequence=(
+            (
+                project.constants.ORCHESTRATION.PCLOCK.name,
+                project.constants.ORCHESTRATION.GLOCKENSPIEL.name,
+            ),
+        ),
+    )
+    forget_overlapping_tuning_fork_note_tuple()
+
+
+def make_clock_tuple(
+    poem_line_tuple,
+    jobs: int = 1,
+    clock_cache=None,
+    build_planner=None,
+    page_index_tuple=None,
+    instrument_name_tuple=None,
+) -> tuple[clock_interfaces.Clock, ...]:
+    """Make one clock for each poem line, in page order.
+
+    With ``jobs > 1`` the pages are built in a process pool. Each
+    worker opens the diary storage itself. The gatra walks
+    are done before in the main process, because all pages with the
+    same scale family share one deterministic walk: so each page gets
+    the same scale positions, no matter in which process it is built.
+
+    If a :class:`project.cache.ClockCache` is passed, pages which
+    are already cached are loaded and only the others are built.
+    If additionally a :class:`project.planner.BuildPlanner` is passed,
+    the cache key of each page only covers those entries which the
+    page could have used: so after changing one entry, only the pages
+    which depend on this entry are built again.
+
+    If ``page_index_tuple`` is set, only the clocks of these pages are
+    made (and returned). ``instrument_name_tuple`` is passed to
+    :func:`make_clock`.
+    """
+    if page_index_tuple is None:
+        page_index_tuple = tuple(range(len(poem_line_tuple)))
+
+    # The walks need to be done for all pages until the last requested
+    # page, because pages with the same scale family share one walk.
+    scale_position_tuple_tuple = tuple(
+        get_scale_position_tuple(poem_index, poem_line)
+        for poem_index, poem_line in enumerate(
+            poem_line_tuple[: max(page_index_tuple, default=-1) + 1]
+        )
+    )
+    argument_tuple_tuple = tuple(
+        (
+            poem_index,
+            poem_line_tuple[poem_index],
+            scale_position_tuple_tuple[poem_index],
+            instrument_name_tuple,
+        )
+        for poem_index in page_index_tuple
     )
 
-    start_clock_line = (
-        _clock_rest(before_rest_duration) if before_rest_duration > 0 else None
+    def get_source_hash(poem_index):
+        if build_planner is not None:
+            return build_planner.get_page_source_hash(poem_index)
+        return source_hash
+
+    page_index_to_clock = {}
+    if clock_cache is not None:
+        if build_planner is not None:
+            build_planner.report(page_index_tuple)
+        else:
+            source_hash = project.cache.get_source_hash()
+        for argument_tuple in argument_tuple_tuple:
+            poem_index = argument_tuple[0]
+            key = get_clock_key(*argument_tuple, get_source_hash(poem_index))
+            with project.profiler.stage("load cached clock", page=poem_index):
+                clock = clock_cache.get(key)
+            if clock is not None:
+                print("load cached clock for page", poem_index)
+                page_index_to_clock[poem_index] = clock
+
+    missing_argument_tuple_tuple = tuple(
+        argument_tuple
+        for argument_tuple in argument_tuple_tuple
+        if argument_tuple[0] not in page_index_to_clock
     )
-    end_clock_line = _clock_end(scale)
-    clock = clock_interfaces.Clock(main_clock_line, start_clock_line, end_clock_line)
+    if missing_argument_tuple_tuple:
+        for argument_tuple, (clock, entry_name_tuple) in zip(
+            missing_argument_tuple_tuple,
+            _make_clock_tuple(
+                missing_argument_tuple_tuple, jobs, trace=build_planner is not None
+            ),
+        ):
+            poem_index = argument_tuple[0]
+            page_index_to_clock[poem_index] = clock
+            if build_planner is not None:
+                build_planner.set_page_state(poem_index, entry_name_tuple, None)
+            if clock_cache is not None:
+                key = get_clock_key(*argument_tuple, get_source_hash(poem_index))
+                clock_cache.set(key, clock)
+        if clock_cache is not None:
+            clock_cache.evict()
+
+    if build_planner is not None:
+        for argument_tuple in argument_tuple_tuple:
+            poem_index = argument_tuple[0]
+            entry_name_tuple = build_planner.get_page_entry_name_tuple(poem_index)
+            if entry_name_tuple is not None:
+                build_planner.set_page_state(
+                    poem_index,
+                    entry_name_tuple,
+                    get_clock_key(*argument_tuple, get_source_hash(poem_index)),
+                )
+        build_planner.save()
+
+    return tuple(page_index_to_clock[poem_index] for poem_index in page_index_tuple)
+
+
+def _make_clock_tuple(argument_tuple_tuple, jobs: int, trace: bool = False):
+    if jobs > 1:
+        profile = project.profiler.PROFILER is not None
+        # Workers start with the chord caches of the main process.
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_initialize_worker,
+            initargs=(project_generators.get_cache_state(),),
+        ) as executor:
+            result_list = []
+            for clock, entry_name_tuple, trace_event_list, cache_state in executor.map(
+                _make_clock_in_worker,
+                argument_tuple_tuple,
+                (trace for _ in argument_tuple_tuple),
+                (profile for _ in argument_tuple_tuple),
+            ):
+                # Keep the new chord cache items of the workers, so that
+                # they are saved for the next build.
+                project_generators.update_cache_state(cache_state)
+                if profile:
+                    project.profiler.PROFILER.add_trace_event_sequence(trace_event_list)
+                result_list.append((clock, entry_name_tuple))
+            return tuple(result_list)
 
-    return clock
+    from mutwo import diary_interfaces
+
+    load_entries()
+    with diary_interfaces.open():
+        return tuple(
+            _make_traced_clock(argument_tuple, trace)
+            for argument_tuple in argument_tuple_tuple
+        )
+
+
+def _initialize_worker(cache_state):
+    # Forked workers inherit the active profiler of the main process:
+    # it's replaced by a profiler of the worker for each page.
+    if project.profiler.PROFILER is not None:
+        project.profiler.stop()
+    project_generators.update_cache_state(cache_state)
+    _add_known_cache_state(cache_state)
+
+
+# Keys of the chord cache items which the main process already knows
+# (only used in workers).
+_name_to_known_cache_key_set = {}
+
+
+def _add_known_cache_state(cache_state):
+    for name, item_tuple in cache_state.items():
+        _name_to_known_cache_key_set.setdefault(name, set()).update(
+            key for key, _ in item_tuple
+        )
+
+
+def _get_new_cache_state():
+    """Chord cache items which the main process doesn't know yet."""
+    cache_state = {
+        name: tuple(
+            (key, value)
+            for key, value in item_tuple
+            if key not in _name_to_known_cache_key_set.get(name, ())
+        )
+        for name, item_tuple in project_generators.get_cache_state().items()
+    }
+    _add_known_cache_state(cache_state)
+    return cache_state
+
+
+def _make_clock_in_worker(argument_tuple, trace, profile):
+    from mutwo import diary_interfaces
+
+    load_entries()
+    if profile:
+        project.profiler.start()
+    try:
+        with diary_interfaces.open():
+            clock, entry_name_tuple = _make_traced_clock(argument_tuple, trace)
+    finally:
+        if profile:
+            trace_event_list = project.profiler.stop().trace_event_list
+        else:
+            trace_event_list = None
+    return clock, entry_name_tuple, trace_event_list, _get_new_cache_state()
+
+
+def load_entries():
+    """Register all diary entries (see 'project/__init__.py')."""
+    import project.entries
+
+
+def _make_traced_clock(argument_tuple, trace):
+    poem_index, poem_line, scale_position_tuple, instrument_name_tuple = argument_tuple
+
+    def make():
+        return make_clock(
+            poem_index,
+            poem_line,
+            scale_position_tuple=scale_position_tuple,
+            instrument_name_tuple=instrument_name_tuple,
+        )
+
+    with project.profiler.stage("make_clock", page=poem_index):
+        if not trace:
+            return make(), None
+        with project.planner.trace_entries() as entry_name_set:
+            clock = make()
+        return clock, tuple(sorted(entry_name_set))
+
+
+def get_clock_key(
+    poem_index, poem_line, scale_position_tuple, instrument_name_tuple, source_hash
+) -> str:
+    """Find cache key which covers all input of a page."""
+    scale = project.constants.PENTATONIC_SCALE_TUPLE[poem_index]
+    key_part_list = [
+        poem_line,
+        scale.tonic.ratio,
+        tuple(p.ratio for p in scale.scale_family.interval_tuple),
+        get_part_count_and_energy(poem_index),
+        # The page seed (see 'seed_page') and the result
+        # of the deterministic gatra walk.
+        poem_index,
+        scale_position_tuple,
+        source_hash,
+    ]
+    # Previews of some instruments differ from the complete page.
+    if instrument_name_tuple is not None:
+        key_part_list.append(tuple(sorted(instrument_name_tuple)))
+    return project.cache.ClockCache.make_key(*key_part_list)
+
+
+def seed_page(poem_index):
+    # Fix global random state for each page, so that a page
+    # always sounds the same: independent of the pages which
+    # were built before it (or if it was built in another process).
+    random.seed(poem_index)
+    np.random.seed(poem_index)
+
+
+def get_part_count_and_energy(poem_index) -> tuple[int, float]:
+    match poem_index % 4:
+        case 0:
+            part_count = 2
+            energy = 61
+        case 1:
+            part_count = 3
+            energy = 51
+        case 2:
+            part_count = 2
+            energy = 41
+        case 3:
+            part_count = 1
+            energy = 51
+    return part_count, energy
+
+
+def get_scale_position_tuple(poem_index, poem_line):
+    part_count, _ = get_part_count_and_energy(poem_index)
+
+    if not poem_line:
+        return tuple((0, 0) for _ in range(part_count * 4))
+
+    scale = project.constants.PENTATONIC_SCALE_TUPLE[poem_index]
+    gatra_walker = scale_to_gatra_walker(scale)
+    scale_position_array = gatra_walker.get_scale_position_array(
+        gatra_walker.walk_deterministic(0, part_count)
+    )
+    return tuple(map(tuple, scale_position_array.tolist()))
 
 
 def is_conflict(event_placement_0, event_placement_1):
@@ -178,28 +464,62 @@ def may_be_bowed_tuning_fork_conflict(event_placement_0, event_placement_1):
     )
 
 
+# (id(event_placement_0), id(event_placement_1)) ->
+#   (event_placement_0, event_placement_1, overlapping_tuning_fork_note_tuple)
+#
+# We keep the event placements in the cache, so that their ids can't
+# be reused as long as they are cached.
+_overlapping_tuning_fork_note_tuple_cache = {}
+
+
 def get_overlapping_tuning_fork_note_tuple(event_placement_0, event_placement_1):
+    key = (id(event_placement_0), id(event_placement_1))
+    try:
+        return _overlapping_tuning_fork_note_tuple_cache[key][2]
+    except KeyError:
+        pass
+    overlapping_tuning_fork_note_tuple = _get_overlapping_tuning_fork_note_tuple(
+        event_placement_0, event_placement_1
+    )
+    _overlapping_tuning_fork_note_tuple_cache[key] = (
+        event_placement_0,
+        event_placement_1,
+        overlapping_tuning_fork_note_tuple,
+    )
+    return overlapping_tuning_fork_note_tuple
+
+
+def forget_overlapping_tuning_fork_note_tuple(event_placement=None):
+    """Clear cache for given event placement (or for all if ``None``)."""
+    if event_placement is None:
+        _overlapping_tuning_fork_note_tuple_cache.clear()
+        return
+    for key, (ep0, ep1, _) in tuple(_overlapping_tuning_fork_note_tuple_cache.items()):
+        if ep0 is event_placement or ep1 is event_placement:
+            del _overlapping_tuning_fork_note_tuple_cache[key]
+
+
+def _get_overlapping_tuning_fork_note_tuple(event_placement_0, event_placement_1):
     glockenspiel_event, glockenspiel_ep = get_glockenspiel_event(
         event_placement_0, event_placement_1
     )
-    adjusted_glockenspiel_event = glockenspiel_event.set(
-        "duration", glockenspiel_ep.duration, mutate=False
+    # We only need the times of the glockenspiel event scaled to the real
+    # duration of the placement, but want to have the original notes
+    # (because these are the ones which need to be adjusted). So we
+    # don't copy & scale the event, but only calculate the scaled times.
+    duration_function = project_utilities.get_duration_function(
+        glockenspiel_event.duration, glockenspiel_ep.duration, len(glockenspiel_event)
     )
     _, pclock_ep = get_pclock_event(event_placement_0, event_placement_1)
     pclock_duration_range = pclock_ep.time_range
     overlapping_tuning_fork_note_list = []
-    for sequential_event_copy, sequential_event in zip(
-        # We need the duration information from the copied event
-        # (because we only copied the event in order to scale to real
-        # duration), but want to have the original note (because this
-        # is the one which needs to be adjusted).
-        adjusted_glockenspiel_event,
-        glockenspiel_event,
-    ):
+    for sequential_event in glockenspiel_event:
         (
             absolute_time_tuple,
             duration,
-        ) = sequential_event_copy._absolute_time_tuple_and_duration
+        ) = project_utilities.get_scaled_absolute_time_tuple_and_duration(
+            sequential_event, duration_function
+        )
         for start, end, n in zip(
             absolute_time_tuple, absolute_time_tuple[1:] + (duration,), sequential_event
         ):
@@ -237,17 +557,31 @@ def get_tag_event(event_placement_0, event_placement_1, tag):
     return ep.event[tag], ep
 
 
-def scale_to_markov_chain(scale):
+def scale_to_gatra_walker(scale):
+    """Walker which walks deterministically through the gatra of the scale.
+
+    The walker keeps its state, so pages with the same scale family
+    share one walk. The gatra and their adjacency are cached on disk
+    (see :class:`project.cache.GatraAdjacencyCache`).
+    """
     key = tuple(p.ratio for p in scale.scale_family.interval_tuple)
     try:
-        markov_chain = _scale_to_markov_chain[key]
+        gatra_walker = _scale_to_gatra_walker[key]
     except KeyError:
-        gatra_tuple = scale_to_gatra_tuple.convert(scale)
-        markov_chain = _scale_to_markov_chain[
-            key
-        ] = gatra_tuple_to_markov_chain.convert(gatra_tuple)
-        markov_chain.make_deterministic_map()
-    return markov_chain
+        if gatra_adjacency_cache is not None:
+            adjacency = gatra_adjacency_cache.get(key)
+        else:
+            adjacency = None
+        if adjacency is None:
+            adjacency = gatra_tuple_to_adjacency.convert(
+                scale_to_gatra_tuple.convert(scale)
+            )
+            if gatra_adjacency_cache is not None:
+                gatra_adjacency_cache.set(key, adjacency)
+        gatra_walker = _scale_to_gatra_walker[key] = project_converters.GatraWalker(
+            adjacency
+        )
+    return gatra_walker
 
 
 def insert_modal_event(
@@ -275,8 +609,10 @@ def insert_modal_event(
 
 
 scale_to_gatra_tuple = project_converters.ScaleToGatraTuple()
-gatra_tuple_to_markov_chain = project_converters.GatraTupleToMarkovChain()
-_scale_to_markov_chain = {}
+gatra_tuple_to_adjacency = project_converters.GatraTupleToAdjacency()
+_scale_to_gatra_walker = {}
+# Set to 'None' to disable the on-disk cache of gatra adjacencies.
+gatra_adjacency_cache = project.cache.GatraAdjacencyCache()
 
 
 def _clock_rest(rest_duration):
@@ -359,6 +695,10 @@ class TuningForkHitStrategy(timeline_interfaces.ConflictResolutionStrategy):
                     absolute_time + (n.duration.duration * f(1, 2))
                 )
 
+        # The glockenspiel notes may have changed.
+        _, epg = get_glockenspiel_event(event_placement_0, event_placement_1)
+        forget_overlapping_tuning_fork_note_tuple(epg)
+
 
 class TagCountStrategy(timeline_interfaces.TagCountStrategy):
     def __init__(self, prefer_more_level: int = 8):
@@ -374,6 +714,100 @@ class TagCountStrategy(timeline_interfaces.TagCountStrategy):
             return self.tag_count_fewer.resolve_conflict(timeline, conflict)
 
 
+def parse_page_selection(page_selection: str, page_count: int) -> tuple[int, ...]:
+    """Parse page selection like '5-8,12' to sorted page indices."""
+    page_index_set = set([])
+    for part in page_selection.split(","):
+        start, _, end = part.strip().partition("-")
+        start = int(start)
+        end = int(end) if end else start
+        if not (0 <= start <= end < page_count):
+            raise ValueError(f"Invalid page range '{part}' (0-{page_count - 1})")
+        page_index_set.update(range(start, end + 1))
+    return tuple(sorted(page_index_set))
+
+
+def parse_instrument_selection(instrument_selection: str) -> tuple[str, ...]:
+    """Parse instrument selection like 'harp,v' to instrument names."""
+    valid_name_tuple = tuple(
+        getattr(project.constants.ORCHESTRATION, key).name
+        for key in ("PCLOCK", "GLOCKENSPIEL", "V", "HARP")
+    )
+    instrument_name_list = []
+    for name in instrument_selection.split(","):
+        if (name := name.strip()) not in valid_name_tuple:
+            raise ValueError(
+                f"Unknown instrument '{name}' (use {', '.join(valid_name_tuple)})"
+            )
+        instrument_name_list.append(name)
+    return tuple(instrument_name_list)
+
+
+def write_bundle(
+    path, clock_tuple, page_index_tuple, instrument_name_tuple, page_key_tuple
+):
+    """Save clocks as clock bundle, so that they can be rendered later."""
+    project.bundles.write_bundle(
+        path,
+        clock_tuple,
+        page_index_tuple or tuple(range(len(clock_tuple))),
+        # Renders of all pages also create the complete score.
+        is_partial=page_index_tuple is not None,
+        instrument_name_tuple=instrument_name_tuple,
+        page_key_tuple=page_key_tuple,
+    )
+
+
+def render_bundle(
+    target,
+    path,
+    notate_item="all",
+    page_index_tuple=None,
+    instrument_name_tuple=None,
+    jobs=1,
+):
+    """Render clocks of a clock bundle, without the diary storage.
+
+    By default all pages and all instruments of the bundle are rendered.
+    The midi files are rendered in ``jobs`` processes.
+    """
+    if target == "illustration":
+        project.render.illustration()
+        return
+
+    with project.bundles.ClockBundle(path) as bundle:
+        if page_index_tuple is None and not bundle.meta["is_partial"]:
+            clock_tuple = bundle.get_clock_tuple()
+            page_key_tuple = bundle.meta["page_key_tuple"]
+        else:
+            page_index_tuple = page_index_tuple or bundle.page_index_tuple
+            clock_tuple = bundle.get_clock_tuple(page_index_tuple)
+            if (page_key_tuple := bundle.meta["page_key_tuple"]) is not None:
+                page_index_to_key = dict(zip(bundle.page_index_tuple, page_key_tuple))
+                page_key_tuple = tuple(map(page_index_to_key.get, page_index_tuple))
+        if instrument_name_tuple is None and (
+            instrument_name_list := bundle.meta["instrument_name_tuple"]
+        ):
+            instrument_name_tuple = tuple(instrument_name_list)
+
+    match target:
+        case "notation":
+            project.render.notation(
+                clock_tuple,
+                notate_item,
+                page_key_tuple,
+                page_index_tuple=page_index_tuple,
+                instrument_name_tuple=instrument_name_tuple,
+            )
+        case "midi":
+            project.render.midi(
+                clock_tuple,
+                page_index_tuple=page_index_tuple,
+                instrument_name_tuple=instrument_name_tuple,
+                jobs=jobs,
+            )
+
+
 if __name__ == "__main__":
     import argparse
 
@@ -382,31 +816,173 @@ if __name__ == "__main__":
     parser.add_argument("-n", "--notation", default="")
     parser.add_argument("-s", "--sound", action="store_true")
     parser.add_argument("-m", "--max-index", default=16)
+    parser.add_argument("-j", "--jobs", default=1)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--cache-size", default=project.cache.MAX_CACHE_SIZE)
+    parser.add_argument("-I", "--incremental", action="store_true")
+    parser.add_argument(
+        "--profile", nargs="?", const=project.profiler.PROFILE_PATH, default=None
+    )
+    parser.add_argument("-p", "--pages", default=None)
+    parser.add_argument("--instruments", default=None)
+    parser.add_argument("--stage", choices=("clocks", "notation", "midi"), default=None)
+    parser.add_argument(
+        "-b", "--bundle", nargs="?", const=project.bundles.BUNDLE_PATH, default=None
+    )
+
+    # 'python main.py render notation|midi|illustration [BUNDLE]'
+    subparsers = parser.add_subparsers(dest="command")
+    render_parser = subparsers.add_parser("render")
+    render_parser.add_argument("target", choices=("notation", "midi", "illustration"))
+    render_parser.add_argument("path", nargs="?", default=project.bundles.BUNDLE_PATH)
+    render_parser.add_argument("-n", "--notation", default="all", dest="notate_item")
+    render_parser.add_argument("-p", "--pages", default=None, dest="render_pages")
+    render_parser.add_argument("--instruments", default=None, dest="render_instruments")
 
     args = parser.parse_args()
+
+    if args.command == "render":
+        try:
+            if args.render_pages:
+                with project.bundles.ClockBundle(args.path) as bundle:
+                    page_count = max(bundle.page_index_tuple, default=-1) + 1
+                page_index_tuple = parse_page_selection(args.render_pages, page_count)
+            else:
+                page_index_tuple = None
+            if args.render_instruments:
+                instrument_name_tuple = parse_instrument_selection(
+                    args.render_instruments
+                )
+            else:
+                instrument_name_tuple = None
+        except ValueError as e:
+            parser.error(str(e))
+        if args.profile:
+            project.profiler.start()
+        with project.profiler.stage(f"render {args.target}"):
+            try:
+                render_bundle(
+                    args.target,
+                    args.path,
+                    args.notate_item,
+                    page_index_tuple,
+                    instrument_name_tuple,
+                    jobs=int(args.jobs),
+                )
+            except (FileNotFoundError, KeyError, ValueError) as e:
+                parser.error(str(e))
+        if args.profile:
+            profiler = project.profiler.stop()
+            profiler.write(args.profile)
+            print(profiler.summary())
+            print("wrote trace to", args.profile)
+        raise SystemExit(0)
+
+    if args.incremental and args.no_cache:
+        parser.error("--incremental needs the clock cache")
     max_index = int(args.max_index)
+    jobs = int(args.jobs)
+
+    poem_line_tuple = tuple(project.constants.POEM.split("\n"))[:max_index]
+    try:
+        if args.pages:
+            page_index_tuple = parse_page_selection(args.pages, len(poem_line_tuple))
+        else:
+            page_index_tuple = None
+        if args.instruments:
+            instrument_name_tuple = parse_instrument_selection(args.instruments)
+        else:
+            instrument_name_tuple = None
+    except ValueError as e:
+        parser.error(str(e))
+    if instrument_name_tuple is not None and args.incremental:
+        # Previews of some instruments don't use all entries of a page.
+        parser.error("--instruments can't be combined with --incremental")
+
+    match args.stage:
+        case "clocks":
+            args.notation, args.sound = "", False
+        case "notation":
+            args.notation, args.sound = args.notation or "all", False
+        case "midi":
+            args.notation, args.sound = "", True
+
+    if args.profile:
+        project.profiler.start()
 
     if args.illustration:
-        project.render.illustration()
+        with project.profiler.stage("illustration"):
+            project.render.illustration()
 
     # import logging
     # from mutwo import diary_converters
     # diary_converters.configurations.LOGGING_LEVEL = logging.DEBUG
 
-    from mutwo import diary_interfaces
-
-    with diary_interfaces.open():
-        clock_list = []
-        for index, line in enumerate(project.constants.POEM.split("\n")):
-            if index < max_index:
-                clock_list.append(make_clock(index, line))
-            else:
-                break
-
-    clock_tuple = tuple(clock_list)
+    if args.no_cache:
+        clock_cache = None
+        gatra_adjacency_cache = None
+    else:
+        clock_cache = project.cache.ClockCache(max_size=int(args.cache_size))
+        project_generators.load_cache(project.cache.CHORD_CACHE_PATH)
+    if args.incremental:
+        build_planner = project.planner.BuildPlanner()
+    else:
+        build_planner = None
+    with project.profiler.stage("make_clock_tuple"):
+        clock_tuple = make_clock_tuple(
+            poem_line_tuple,
+            jobs=jobs,
+            clock_cache=clock_cache,
+            build_planner=build_planner,
+            page_index_tuple=page_index_tuple,
+            instrument_name_tuple=instrument_name_tuple,
+        )
+    if not args.no_cache:
+        project_generators.save_cache(project.cache.CHORD_CACHE_PATH)
+
+    if build_planner is not None:
+        # Only re-render pages which changed.
+        page_key_tuple = tuple(
+            build_planner.get_page_clock_key(poem_index)
+            for poem_index in page_index_tuple or range(len(clock_tuple))
+        )
+    else:
+        page_key_tuple = None
+
+    if args.bundle:
+        with project.profiler.stage("write_bundle"):
+            write_bundle(
+                args.bundle,
+                clock_tuple,
+                page_index_tuple,
+                instrument_name_tuple,
+                page_key_tuple,
+            )
+        print("wrote clock bundle to", args.bundle)
 
     if args.notation:
-        project.render.notation(clock_tuple, args.notation)
+        with project.profiler.stage("notation"):
+            project.render.notation(
+                clock_tuple,
+                args.notation,
+                page_key_tuple,
+                page_index_tuple=page_index_tuple,
+                instrument_name_tuple=instrument_name_tuple,
+            )
 
     if args.sound:
-        project.render.midi(clock_tuple)
+        with project.profiler.stage("midi"):
+            project.render.midi(
+                clock_tuple,
+                page_index_tuple=page_index_tuple,
+                instrument_name_tuple=instrument_name_tuple,
+                jobs=jobs,
+            )
+
+    if args.profile:
+        profiler = project.profiler.stop()
+        profiler.write(args.profile)
+        print(profiler.summary())
+        for name, cache_info in project_generators.get_cache_info().items():
+            print(name, cache_info)
+        print("wrote trace to", args.profile)
@@ -1,3 +1,5 @@
+import typing
+
 from mutwo import core_converters
 from mutwo import core_events
 from mutwo import core_parameters
@@ -81,3 +83,80 @@ class FilterArcoNoteLike(core_converters.abc.SymmetricalEventConverter):
         return self._convert_event(
             event_to_convert.copy(), core_parameters.DirectDuration(0)
         )
+
+
+class PartitionEvent(core_converters.abc.Converter):
+    """Split an event into one event for each key, by walking the event once.
+
+    :param classify: Returns the key of a simple event or ``None`` if
+        the simple event should be part of all events.
+    :type classify: typing.Callable[[core_events.SimpleEvent], typing.Hashable]
+    :param key_tuple: The keys of the returned events (in this order).
+    :type key_tuple: tuple[typing.Hashable, ...]
+
+    In the event of a key all simple events which belong to another key
+    are replaced by rests. Unlike :class:`FilterPizzicatoNoteLike` and
+    :class:`FilterArcoNoteLike` the event isn't copied: the returned
+    events share all simple events and all complex events which don't
+    contain any simple event of another key with the converted event.
+    Only the outermost event is always new, so that it can get its
+    own tag.
+
+    **Example:**
+
+    >>> pizz, arco = PartitionEvent(get_contact_point, ("pizzicato", "arco"))(event)
+    """
+
+    def __init__(
+        self,
+        classify: typing.Callable[[core_events.SimpleEvent], typing.Hashable],
+        key_tuple: tuple[typing.Hashable, ...],
+    ):
+        self.classify = classify
+        self.key_tuple = key_tuple
+
+    def _partition(self, event):
+        if isinstance(event, core_events.abc.ComplexEvent):
+            partition_tuple_list = [self._partition(e) for e in event]
+            event_list = []
+            for index in range(len(self.key_tuple)):
+                child_list = [p[index] for p in partition_tuple_list]
+                if all(c is e for c, e in zip(child_list, event)):
+                    event_list.append(event)
+                else:
+                    event_list.append(event.empty_copy())
+                    event_list[-1].extend(child_list)
+            return tuple(event_list)
+        key = self.classify(event)
+        return tuple(
+            (
+                event
+                if key is None or key == k
+                else core_events.SimpleEvent(event.duration)
+            )
+            for k in self.key_tuple
+        )
+
+    def convert(self, event_to_convert: core_events.abc.ComplexEvent) -> tuple:
+        event_list = []
+        for event in self._partition(event_to_convert):
+            if event is event_to_convert:
+                event = event_to_convert.empty_copy()
+                event.extend(event_to_convert)
+            event_list.append(event)
+        return tuple(event_list)
+
+
+def get_contact_point(event: core_events.SimpleEvent) -> typing.Optional[str]:
+    """'pizzicato' or 'arco' (``None`` if the event has no playing indicators).
+
+    Splits events in the same way as :class:`FilterPizzicatoNoteLike` and
+    :class:`FilterArcoNoteLike`.
+    """
+    if c := getattr(event, "playing_indicator_collection", None):
+        return (
+            "pizzicato"
+            if c.string_contact_point.contact_point == "pizzicato"
+            else "arco"
+        )
+    return None
@@ -1,12 +1,21 @@
+import collections
 import itertools
 import typing
 
+import numpy as np
 import yamm
 
 from mutwo import core_converters
 from mutwo import music_parameters
 
-__all__ = ("ScaleToGatraTuple", "GatraTupleToMarkovChain")
+__all__ = (
+    "GatraAdjacency",
+    "ScaleToGatraTuple",
+    "GatraTupleToAdjacency",
+    "GatraTupleToMarkovChain",
+    "GatraWalker",
+    "make_movement_dict",
+)
 
 # ########################################
 # BEGIN copied from 'music_parameters/scales.py'
@@ -16,10 +25,8 @@ ScalePosition: typing.TypeAlias = tuple[ScaleDegree, PeriodRepetitionCount]
 # END
 # ########################################
 
-Gatra: typing.TypeAlias = tuple[
-    ScalePosition, ScalePosition, ScalePosition, ScalePosition
-]
-"""A line/bar composed of four different pitches.
+Gatra: typing.TypeAlias = tuple[ScalePosition, ...]
+"""A line/bar composed of (usually) four different pitches.
 
 The term 'gatra' is borrowed from Javanese Karawitan. It denotes
 a sequence of four pitches, where - according to the ding/dong principle -
@@ -46,7 +53,18 @@ VALID_MOVEMENT_DICT = {
 
 
 class ScaleToGatraTuple(core_converters.abc.Converter):
-    """Find all valid gatra in a pentatonic scale.
+    """Find all valid gatra in a scale.
+
+    :param movement_dict: Allowed movements from a scale degree to other
+        scale degrees. If ``None`` the movements of
+        :func:`make_movement_dict` for the size of the converted scale
+        are used (for pentatonic scales this is
+        :const:`VALID_MOVEMENT_DICT`).
+    :type movement_dict: typing.Optional[dict[ScaleDegree, set[ScaleDegree]]]
+    :param gatra_size: How many scale positions each gatra has (at
+        least one). The stressed positions (the second, the fourth, ...)
+        are always the tonic or the dominant.
+    :type gatra_size: int
 
     The idea is to use those gatra, combine them to a longer sequence
     of scale positions and finally create ModalContext events from this
@@ -62,37 +80,45 @@ class ScaleToGatraTuple(core_converters.abc.Converter):
     It's really just a subtle variation of a drone.
     """
 
-    # Only for pentatonic scales
-    SCALE_SIZE = 5
+    def __init__(
+        self,
+        movement_dict: typing.Optional[dict[ScaleDegree, set[ScaleDegree]]] = None,
+        gatra_size: int = 4,
+    ):
+        if gatra_size < 1:
+            raise ValueError(
+                f"Invalid gatra_size '{gatra_size}': gatra need at least one "
+                "scale position."
+            )
+        self.movement_dict = movement_dict
+        self.gatra_size = gatra_size
 
     def convert(self, scale: music_parameters.Scale) -> tuple[Gatra, ...]:
-        assert len(set(scale.scale_family.scale_degree_tuple)) == self.SCALE_SIZE
-        dominant_scale_degree = self._find_dominant_scale_degree(scale)
+        scale_size = len(set(scale.scale_family.scale_degree_tuple))
+        movement_dict = self.movement_dict
+        if movement_dict is None:
+            movement_dict = make_movement_dict(scale_size)
+        dominant_scale_degree = self._find_dominant_scale_degree(scale, scale_size)
         main_scale_degree_tuple = (0, dominant_scale_degree)
-        scale_degree_tuple = tuple(range(self.SCALE_SIZE))
-        gatra_list = []
-        for candidate in itertools.product(
-            scale_degree_tuple,
-            main_scale_degree_tuple,
-            scale_degree_tuple,
-            main_scale_degree_tuple,
-        ):
-            is_illegal = False
-            for s0, s1 in zip(candidate, candidate[1:]):
-                if is_illegal := (s1 not in VALID_MOVEMENT_DICT[s0]):
-                    break
-            if is_illegal:
-                continue
-            scale_position_tuple = tuple(
-                (scale_degree, 0) for scale_degree in candidate
-            )
-            gatra_list.append(scale_position_tuple)
-        return tuple(gatra_list)  # type: ignore
+        scale_degree_tuple = tuple(range(scale_size))
+        candidate_tuple_tuple = tuple(
+            main_scale_degree_tuple if index % 2 else scale_degree_tuple
+            for index in range(self.gatra_size)
+        )
+        scale_position_tuple = tuple(
+            (scale_degree, 0) for scale_degree in scale_degree_tuple
+        )
+        return tuple(
+            tuple(map(scale_position_tuple.__getitem__, path))
+            for path in _find_path_tuple(candidate_tuple_tuple, movement_dict)
+        )
 
-    def _find_dominant_scale_degree(self, scale: music_parameters.Scale) -> int:
+    def _find_dominant_scale_degree(
+        self, scale: music_parameters.Scale, scale_size: int
+    ) -> int:
         main = scale.scale_position_to_pitch((0, 0))
         champion, fitness = 0, 0
-        for candidate in range(1, self.SCALE_SIZE):
+        for candidate in range(1, scale_size):
             pcandidate = scale.scale_position_to_pitch((candidate, 0))
             h = (main - pcandidate).harmonicity_simplified_barlow
             if h > fitness:
@@ -101,11 +127,325 @@ class ScaleToGatraTuple(core_converters.abc.Converter):
         return champion
 
 
+def make_movement_dict(scale_size: int) -> dict[ScaleDegree, set[ScaleDegree]]:
+    """Make allowed movements for a scale with the given number of degrees.
+
+    The rules are the same as in :const:`VALID_MOVEMENT_DICT`: 0 can move
+    anywhere and any scale degree can move to 0, all other scale degrees
+    can only move to their neighbours.
+
+    **Example:**
+
+    >>> make_movement_dict(5) == VALID_MOVEMENT_DICT
+    True
+    """
+    movement_dict = {0: set(range(1, scale_size))}
+    for scale_degree in range(1, scale_size):
+        movement_dict[scale_degree] = {0, scale_degree - 1} | (
+            {scale_degree + 1} if scale_degree + 1 < scale_size else set()
+        )
+    return movement_dict
+
+
+def _find_path_tuple(
+    candidate_tuple_tuple: tuple[tuple[ScaleDegree, ...], ...],
+    movement_dict: dict[ScaleDegree, set[ScaleDegree]],
+) -> tuple[tuple[ScaleDegree, ...], ...]:
+    # Find all paths through the movement graph which visit one of the
+    # candidates at each position (in the same order as
+    # 'itertools.product' would). First we go backwards through the
+    # positions and only keep candidates from which the path can still
+    # be finished. Then the paths are extended position by position:
+    # because of the first step each extended path is a prefix of at
+    # least one legal path, so we never build a path which is dropped
+    # afterwards.
+    live_candidate_list = list(candidate_tuple_tuple)
+    for index in reversed(range(len(candidate_tuple_tuple) - 1)):
+        live_candidate_set = set(live_candidate_list[index + 1])
+        live_candidate_list[index] = tuple(
+            scale_degree
+            for scale_degree in live_candidate_list[index]
+            if not movement_dict.get(scale_degree, set()).isdisjoint(live_candidate_set)
+        )
+
+    if not live_candidate_list:
+        return ((),)
+    path_list = [(scale_degree,) for scale_degree in live_candidate_list[0]]
+    for candidate_tuple in live_candidate_list[1:]:
+        scale_degree_to_next_tuple = {
+            scale_degree: tuple(
+                next_scale_degree
+                for next_scale_degree in candidate_tuple
+                if next_scale_degree in movement_dict.get(scale_degree, set())
+            )
+            for scale_degree in set(path[-1] for path in path_list)
+        }
+        path_list = [
+            path + (next_scale_degree,)
+            for path in path_list
+            for next_scale_degree in scale_degree_to_next_tuple[path[-1]]
+        ]
+    return tuple(path_list)
+
+
+GatraAdjacency = collections.namedtuple(
+    "GatraAdjacency", ("gatra_tuple", "index_pointer_array", "index_array")
+)
+"""Which gatra can follow which gatra, in compressed sparse row format.
+
+The gatra which can follow ``gatra_tuple[i]`` are the gatra with
+the indices ``index_array[index_pointer_array[i]:index_pointer_array[i + 1]]``
+(sorted ascending).
+"""
+
+
+class GatraTupleToAdjacency(core_converters.abc.Converter):
+    """Find which gatra can follow which gatra.
+
+    :param movement_dict: Allowed movements from a scale degree to other
+        scale degrees. If ``None`` the movements of
+        :func:`make_movement_dict` are used.
+    :type movement_dict: typing.Optional[dict[ScaleDegree, set[ScaleDegree]]]
+
+    A gatra can follow another gatra if the movement from the last
+    scale degree of the first gatra to the first scale degree of the
+    second gatra is allowed (a gatra never follows itself). Gatra are
+    grouped by their first scale degree, so that each gatra is only
+    compared with the groups it can move to: the time is proportional
+    to the number of edges and not to the square of the number of gatra.
+    """
+
+    def __init__(
+        self,
+        movement_dict: typing.Optional[dict[ScaleDegree, set[ScaleDegree]]] = None,
+    ):
+        self.movement_dict = movement_dict
+
+    def convert(self, gatra_tuple: tuple[Gatra, ...]) -> GatraAdjacency:
+        movement_dict = self.movement_dict
+        if movement_dict is None:
+            movement_dict = make_movement_dict(
+                max((p[0] for g in gatra_tuple for p in g), default=0) + 1
+            )
+
+        first_scale_degree_to_index_list = collections.defaultdict(list)
+        for index, gatra in enumerate(gatra_tuple):
+            first_scale_degree_to_index_list[gatra[0][0]].append(index)
+
+        last_scale_degree_to_index_tuple = {}
+        index_pointer_list, index_list = [0], []
+        for index, gatra in enumerate(gatra_tuple):
+            last_scale_degree = gatra[-1][0]
+            try:
+                index_tuple = last_scale_degree_to_index_tuple[last_scale_degree]
+            except KeyError:
+                index_tuple = last_scale_degree_to_index_tuple[last_scale_degree] = (
+                    tuple(
+                        sorted(
+                            itertools.chain.from_iterable(
+                                first_scale_degree_to_index_list.get(scale_degree, ())
+                                for scale_degree in movement_dict[last_scale_degree]
+                            )
+                        )
+                    )
+                )
+            index_list.extend(i for i in index_tuple if i != index)
+            index_pointer_list.append(len(index_list))
+
+        return GatraAdjacency(
+            tuple(gatra_tuple),
+            np.array(index_pointer_list, dtype=np.int64),
+            np.array(index_list, dtype=np.int32),
+        )
+
+
 class GatraTupleToMarkovChain(core_converters.abc.Converter):
-    def convert(self, gatra_tuple: tuple[Gatra, ...]) -> yamm.chain.Chain:
-        d = {(g,): {} for g in gatra_tuple}
-        for gatra_pair in itertools.combinations(gatra_tuple, 2):
-            for g0, g1 in itertools.permutations(gatra_pair):
-                if g1[0][0] in VALID_MOVEMENT_DICT[g0[-1][0]]:
-                    d[(g0,)][g1] = 1
-        return yamm.chain.Chain(d)
+    """Make markov chain of gatra where each allowed movement has weight 1.
+
+    :param movement_dict: Allowed movements from a scale degree to other
+        scale degrees. If ``None`` the movements of
+        :func:`make_movement_dict` are used.
+    :type movement_dict: typing.Optional[dict[ScaleDegree, set[ScaleDegree]]]
+    """
+
+    def __init__(
+        self,
+        movement_dict: typing.Optional[dict[ScaleDegree, set[ScaleDegree]]] = None,
+    ):
+        self._gatra_tuple_to_adjacency = GatraTupleToAdjacency(movement_dict)
+
+    def convert(
+        self, gatra_tuple_or_adjacency: tuple[Gatra, ...] | GatraAdjacency
+    ) -> yamm.chain.Chain:
+        if isinstance(gatra_tuple_or_adjacency, GatraAdjacency):
+            adjacency = gatra_tuple_or_adjacency
+        else:
+            adjacency = self._gatra_tuple_to_adjacency.convert(gatra_tuple_or_adjacency)
+        gatra_tuple = adjacency.gatra_tuple
+        index_pointer_list = adjacency.index_pointer_array.tolist()
+        index_list = adjacency.index_array.tolist()
+        return yamm.chain.Chain(
+            {
+                (g,): {gatra_tuple[i]: 1 for i in index_list[start:stop]}
+                for g, start, stop in zip(
+                    gatra_tuple, index_pointer_list, index_pointer_list[1:]
+                )
+            }
+        )
+
+
+class GatraWalker(object):
+    """Walk through gatra (with arrays instead of a markov chain).
+
+    :param adjacency: Which gatra can follow which gatra (see
+        :class:`GatraTupleToAdjacency`).
+    :type adjacency: GatraAdjacency
+
+    All walks return the indices of the visited gatra: the first index
+    is always the start gatra. :meth:`get_scale_position_array` turns
+    these indices into scale positions. Like in a
+    :class:`GatraTupleToMarkovChain` chain each gatra has the same
+    weight. Unlike in the chain a walk which reaches a gatra without
+    any followers continues with the start gatra (the chain would
+    yield ``None`` first).
+
+    **Example:**
+
+    >>> gatra_tuple = (((0, 0), (1, 0)), ((1, 0), (2, 0)), ((2, 0), (0, 0)))
+    >>> walker = GatraWalker(GatraTupleToAdjacency().convert(gatra_tuple))
+    >>> walker.walk_deterministic(0, 3)
+    array([0, 2, 1])
+    >>> walker.get_scale_position_array(walker.walk_deterministic(0, 3))
+    array([[0, 0],
+           [1, 0],
+           [2, 0],
+           [0, 0],
+           [1, 0],
+           [2, 0]])
+    """
+
+    def __init__(self, adjacency: GatraAdjacency):
+        self.adjacency = adjacency
+        self.index_pointer_array = adjacency.index_pointer_array
+        self.index_array = adjacency.index_array
+        self.follower_count_array = np.diff(self.index_pointer_array)
+        self.scale_position_array = np.array(adjacency.gatra_tuple, dtype=np.int64)
+        self._index_pointer_list = self.index_pointer_array.tolist()
+        self._index_list = self.index_array.tolist()
+        self.reset()
+
+    def __len__(self) -> int:
+        return len(self.adjacency.gatra_tuple)
+
+    def reset(self):
+        """Reset the state of :meth:`walk_deterministic`."""
+        self._position_list = [0] * len(self)
+
+    def walk_deterministic(
+        self, start_index: int = 0, gatra_count: int = 1
+    ) -> np.ndarray:
+        """Walk deterministically from the given gatra.
+
+        Each gatra cycles through its followers. This state is kept
+        between different calls (until :meth:`reset`), so the walk
+        behaves like ``yamm.chain.Chain.walk_deterministic`` of a
+        :class:`GatraTupleToMarkovChain` chain, when a new walk
+        generator is created for each call.
+        """
+        index_pointer_list, index_list = self._index_pointer_list, self._index_list
+        position_list = self._position_list
+        index, walk_list = start_index, [start_index]
+        for _ in range(gatra_count - 1):
+            start, stop = index_pointer_list[index], index_pointer_list[index + 1]
+            if start == stop:
+                index = start_index
+            else:
+                position = position_list[index]
+                position_list[index] = (position + 1) % (stop - start)
+                index = index_list[start + position]
+            walk_list.append(index)
+        return np.array(walk_list[:gatra_count], dtype=np.intp)
+
+    def walk_deterministic_batch(
+        self, start_index_array: typing.Sequence[int], gatra_count: int
+    ) -> np.ndarray:
+        """Make many deterministic walks at once.
+
+        :param start_index_array: The start gatra of each walk.
+        :param gatra_count: How many gatra each walk has.
+
+        Each walk starts with a fresh state (it neither uses nor
+        changes the state of :meth:`walk_deterministic`). Returns an
+        array with one row for each walk.
+        """
+        start_index_array = np.asarray(start_index_array, dtype=np.intp)
+        walk_count = len(start_index_array)
+        position_array = np.zeros((walk_count, len(self)), dtype=np.int32)
+        walk_index_array = np.arange(walk_count)
+
+        def get_position_array(index_array, follower_count_array):
+            position_array_ = position_array[walk_index_array, index_array]
+            position_array[walk_index_array, index_array] = (
+                position_array_ + 1
+            ) % np.maximum(follower_count_array, 1)
+            return position_array_
+
+        return self._walk(start_index_array, gatra_count, get_position_array)
+
+    def walk(
+        self,
+        start_index_array: typing.Sequence[int],
+        gatra_count: int,
+        seed: typing.Optional[int] = None,
+    ) -> np.ndarray:
+        """Make many random walks at once.
+
+        :param start_index_array: The start gatra of each walk.
+        :param gatra_count: How many gatra each walk has.
+        :param seed: Seed of the random walks. With the same seed the
+            same walks are made.
+
+        Returns an array with one row for each walk.
+        """
+        random = np.random.default_rng(seed)
+        start_index_array = np.asarray(start_index_array, dtype=np.intp)
+
+        def get_position_array(index_array, follower_count_array):
+            return (random.random(len(index_array)) * follower_count_array).astype(
+                np.intp
+            )
+
+        return self._walk(start_index_array, gatra_count, get_position_array)
+
+    def get_scale_position_array(self, walk_array: np.ndarray) -> np.ndarray:
+        """Get scale positions of the visited gatra of one or many walks.
+
+        The gatra of each walk are concatenated: a walk with ``n``
+        gatra of size ``m`` becomes an array of shape ``(n * m, 2)``.
+        """
+        walk_array = np.asarray(walk_array)
+        scale_position_array = self.scale_position_array[walk_array]
+        return scale_position_array.reshape(walk_array.shape[:-1] + (-1, 2))
+
+    def _walk(self, start_index_array, gatra_count, get_position_array):
+        walk_array = np.empty((len(start_index_array), gatra_count), dtype=np.intp)
+        if gatra_count == 0:
+            return walk_array
+        index_array = walk_array[:, 0] = start_index_array
+        for gatra_index in range(1, gatra_count):
+            follower_count_array = self.follower_count_array[index_array]
+            has_follower_array = follower_count_array > 0
+            position_array = get_position_array(index_array, follower_count_array)
+            if has_follower_array.all():
+                index_array = self.index_array[
+                    self.index_pointer_array[index_array] + position_array
+                ]
+            else:
+                next_index_array = start_index_array.copy()
+                next_index_array[has_follower_array] = self.index_array[
+                    self.index_pointer_array[index_array[has_follower_array]]
+                    + position_array[has_follower_array]
+                ]
+                index_array = next_index_array
+            walk_array[:, gatra_index] = index_array
+        return walk_array
@@ -1,6 +1,8 @@
+import copy
 import typing
 import warnings
 
+import numpy as np
 import quicktions as fractions
 
 from mutwo import core_constants
@@ -42,10 +44,12 @@ class TremoloConverter(music_converters.PlayingIndicatorConverter):
 
     def __init__(
         self,
-        min_duration: core_parameters.abc.Duration
-        | float = core_parameters.DirectDuration(0.25),
-        max_duration: core_parameters.abc.Duration
-        | float = core_parameters.DirectDuration(0.95),
+        min_duration: (
+            core_parameters.abc.Duration | float
+        ) = core_parameters.DirectDuration(0.25),
+        max_duration: (
+            core_parameters.abc.Duration | float
+        ) = core_parameters.DirectDuration(0.95),
         simple_event_to_playing_indicator_collection: typing.Callable[
             [core_events.SimpleEvent],
             music_parameters.PlayingIndicatorCollection,
@@ -60,17 +64,26 @@ class TremoloConverter(music_converters.PlayingIndicatorConverter):
         self._average_duration = average_duration = (
             (max_duration - min_duration) * fractions.Fraction(1, 2)
         ) + min_duration
-        self._d_none = [[0, average_duration], [1, average_duration]]
-        self._d_acc = [[0, max_duration], [1, min_duration]]
-        self._d_rit = [[0, min_duration], [1, max_duration]]
-        self._d_rit_acc = [[0, min_duration], [0.5, max_duration], [1, min_duration]]
-        self._d_acc_rit = [
-            # [0, max_duration, -1],
-            [0, max_duration, -6],
-            # [0.5, min_duration, 2],
-            [0.5, min_duration, 4],
-            [1, max_duration],
-        ]
+        D = music_parameters.Tremolo.D
+        self._d_none = _make_duration_curve(
+            [[0, average_duration], [1, average_duration]]
+        )
+        self._dynamic_to_duration_curve = {
+            D.Acc: _make_duration_curve([[0, max_duration], [1, min_duration]]),
+            D.Rit: _make_duration_curve([[0, min_duration], [1, max_duration]]),
+            D.RitAcc: _make_duration_curve(
+                [[0, min_duration], [0.5, max_duration], [1, min_duration]]
+            ),
+            D.AccRit: _make_duration_curve(
+                [
+                    # [0, max_duration, -1],
+                    [0, max_duration, -6],
+                    # [0.5, min_duration, 2],
+                    [0.5, min_duration, 4],
+                    [1, max_duration],
+                ]
+            ),
+        }
         super().__init__(simple_event_to_playing_indicator_collection)
 
     def _apply_playing_indicator(
@@ -78,32 +91,29 @@ class TremoloConverter(music_converters.PlayingIndicatorConverter):
         simple_event_to_convert: core_events.SimpleEvent,
         playing_indicator: music_parameters.Tremolo,
     ) -> core_events.SequentialEvent[core_events.SimpleEvent]:
-        D = music_parameters.Tremolo.D
         s_dur = simple_event_to_convert.duration
-        event_count = int(s_dur / self._average_duration)
-        match playing_indicator.dynamic:
-            case D.Acc:
-                point_list = self._d_acc
-            case D.Rit:
-                point_list = self._d_rit
-            case D.AccRit:
-                point_list = self._d_acc_rit
-            case D.RitAcc:
-                point_list = self._d_rit_acc
-            case _:
-                point_list = self._d_none
-        duration_envelope = core_events.Envelope(point_list)
+        event_count = max(int(s_dur / self._average_duration), 1)
+        duration_array = _duration_curve_to_duration_array(
+            self._dynamic_to_duration_curve.get(
+                playing_indicator.dynamic, self._d_none
+            ),
+            event_count,
+        )
+        duration_array *= float(s_dur.duration) / duration_array.sum()
+        duration_list = list(map(fractions.Fraction, duration_array[:-1].tolist()))
+        # The last repetition gets the rest, so that the tremolo is
+        # exactly as long as the original event.
+        duration_list.append(s_dur.duration - sum(duration_list))
+
+        # All repetitions share the parameters of one copied event
+        # (only their durations differ).
+        template_event = simple_event_to_convert.copy()
         sequential_event = core_events.SequentialEvent([])
-        max_event_index = event_count - 1
-        for event_index in range(event_count):
-            sequential_event.append(
-                simple_event_to_convert.set(
-                    "duration",
-                    duration_envelope.value_at(event_index / max_event_index),
-                    mutate=False,
-                )
-            )
-        return sequential_event.set("duration", s_dur)
+        for duration in duration_list:
+            event = copy.copy(template_event)
+            event.duration = duration
+            sequential_event.append(event)
+        return sequential_event
 
     @property
     def playing_indicator_name(self) -> str:
@@ -114,6 +124,51 @@ class TremoloConverter(music_converters.PlayingIndicatorConverter):
         return music_parameters.Tremolo()
 
 
+_DurationCurve = tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _make_duration_curve(point_list: list) -> _DurationCurve:
+    """Split envelope points into positions, durations and curve shapes."""
+    position_list, duration_list, curve_shape_list = [], [], []
+    for position, duration, *curve_shape in point_list:
+        position_list.append(position)
+        duration_list.append(
+            core_events.configurations.UNKNOWN_OBJECT_TO_DURATION(
+                duration
+            ).duration_in_floats
+        )
+        curve_shape_list.append(curve_shape[0] if curve_shape else 0)
+    return tuple(
+        np.array(value_list, dtype=np.float64)
+        for value_list in (position_list, duration_list, curve_shape_list)
+    )
+
+
+def _duration_curve_to_duration_array(
+    duration_curve: _DurationCurve, event_count: int
+) -> np.ndarray:
+    """Evaluate curve at 'event_count' equally spaced positions.
+
+    Same as :meth:`mutwo.core_events.Envelope.value_at`, but for all
+    positions at once.
+    """
+    position_array, duration_array, curve_shape_array = duration_curve
+    x = np.linspace(0, 1, event_count)
+    index_array = np.clip(
+        np.searchsorted(position_array, x, side="right") - 1,
+        0,
+        len(position_array) - 2,
+    )
+    x0, x1 = position_array[index_array], position_array[index_array + 1]
+    y0, y1 = duration_array[index_array], duration_array[index_array + 1]
+    curve_shape = curve_shape_array[index_array]
+    percentage = np.clip((x - x0) / (x1 - x0), 0, 1)
+    is_linear = curve_shape == 0
+    curve_shape = np.where(is_linear, 1, curve_shape)
+    curve_percentage = np.expm1(curve_shape * percentage) / np.expm1(curve_shape)
+    return y0 + (y1 - y0) * np.where(is_linear, percentage, curve_percentage)
+
+
 class ClusterConverter(music_converters.PlayingIndicatorConverter):
     def __init__(
         self,
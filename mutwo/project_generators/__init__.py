@@ -1 +1,3 @@
+from .caches import *
 from .chords import *
+from .chord_arrays import *
@@ -0,0 +1,96 @@
+import collections
+import threading
+import typing
+
+__all__ = ("CacheInfo", "LRUCache")
+
+
+CacheInfo = collections.namedtuple(
+    "CacheInfo", ("hit_count", "miss_count", "size", "max_size")
+)
+
+
+class LRUCache(object):
+    """Thread safe cache which forgets the least recently used values.
+
+    :param max_size: How many values are kept at most.
+    :type max_size: int
+
+    **Example:**
+
+    >>> cache = LRUCache(max_size=2)
+    >>> cache.get("a", lambda: 1)
+    1
+    >>> cache.info()
+    CacheInfo(hit_count=0, miss_count=1, size=1, max_size=2)
+
+    The items of a cache can be passed to another cache (e.g. in
+    another process or session), see :meth:`items` and :meth:`update`.
+    """
+
+    def __init__(self, max_size: int = 2**16):
+        self.max_size = max_size
+        self._key_to_value = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hit_count = 0
+        self._miss_count = 0
+
+    def __len__(self) -> int:
+        return len(self._key_to_value)
+
+    def __contains__(self, key: typing.Hashable) -> bool:
+        return key in self._key_to_value
+
+    def get(self, key: typing.Hashable, make: typing.Callable[[], typing.Any]):
+        """Return cached value or make, cache and return a new value."""
+        with self._lock:
+            try:
+                value = self._key_to_value[key]
+            except KeyError:
+                self._miss_count += 1
+            else:
+                self._hit_count += 1
+                self._key_to_value.move_to_end(key)
+                return value
+        # Don't block other threads while the value is made: at worst
+        # the same value is made twice.
+        value = make()
+        with self._lock:
+            self._key_to_value[key] = value
+            self._key_to_value.move_to_end(key)
+            self._evict()
+        return value
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(
+                self._hit_count,
+                self._miss_count,
+                len(self._key_to_value),
+                self.max_size,
+            )
+
+    def items(self) -> tuple[tuple[typing.Hashable, typing.Any], ...]:
+        """All cached items, from least to most recently used."""
+        with self._lock:
+            return tuple(self._key_to_value.items())
+
+    def update(
+        self, item_sequence: typing.Sequence[tuple[typing.Hashable, typing.Any]]
+    ):
+        """Add items (e.g. of :meth:`items` of another cache)."""
+        with self._lock:
+            for key, value in item_sequence:
+                self._key_to_value[key] = value
+                self._key_to_value.move_to_end(key)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._key_to_value.clear()
+            self._hit_count = 0
+            self._miss_count = 0
+
+    def _evict(self):
+        while len(self._key_to_value) > self.max_size:
+            self._key_to_value.popitem(last=False)
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import itertools
+import typing
+
+import numpy as np
+
+from mutwo import music_parameters
+
+from .chords import Chord
+from .chords import _interval
+from .chords import find_chord_iterator
+
+__all__ = ("ChordArray", "find_chord_array")
+
+
+class ChordArray(object):
+    """Chords saved as columns of arrays.
+
+    :param pitch_table: All pitches and ambitus pitches of the chords.
+        The index columns refer to its indices.
+    :type pitch_table: tuple[music_parameters.JustIntonationPitch, ...]
+    :param pitch_index_array: Indices of the pitches of each chord (one
+        row for each chord, filled up with -1).
+    :type pitch_index_array: np.ndarray
+    :param harmonicity_array: Harmonicity of each chord.
+    :type harmonicity_array: np.ndarray
+    :param ambitus_index_array: Indices of the minima and maxima pitch of
+        the ambitus of each chord.
+    :type ambitus_index_array: np.ndarray
+    :param interval_pair_index_array: Indices of both pitches of each
+        interval of each chord (one pair for each interval, filled up
+        with -1).
+    :type interval_pair_index_array: np.ndarray
+    :param fingering_tuple_tuple: Fingering of each chord (``None`` if
+        no chord has a fingering).
+    :type fingering_tuple_tuple: typing.Optional[tuple]
+
+    Instead of many :class:`Chord` objects (each with its own tuples of
+    pitches and intervals), a :class:`ChordArray` only keeps a few
+    arrays. The index arrays use the smallest integer type which fits
+    the pitch table (usually 'int8'). Intervals are saved as pairs of
+    pitch indices and neighbour intervals aren't saved at all (they
+    only depend on the pitches). :class:`Chord` objects (including
+    their intervals) are made when a chord is accessed.
+    Indexing with slices, boolean masks or index arrays returns a new
+    :class:`ChordArray`, so chords can be filtered and sorted with
+    array operations:
+
+    **Example:**
+
+    >>> import ranges
+    >>> from mutwo import music_parameters
+    >>> pitch_tuple = tuple(
+    ...     music_parameters.JustIntonationPitch(ratio)
+    ...     for ratio in ("1/1", "9/8", "5/4", "3/2", "7/4")
+    ... )
+    >>> chord_array = find_chord_array(
+    ...     pitch_tuple=pitch_tuple, pitch_count_range=ranges.Range(3, 4)
+    ... )
+    >>> len(chord_array), chord_array.pitch_index_array.dtype
+    (8, dtype('int8'))
+    >>> chord_array = chord_array[chord_array.harmonicity_array > 0.1]
+    >>> len(chord_array)
+    6
+    >>> chord_array.sort()[0].pitch_tuple
+    (JustIntonationPitch('1/1'), JustIntonationPitch('9/8'), JustIntonationPitch('3/2'))
+    """
+
+    def __init__(
+        self,
+        pitch_table: tuple[music_parameters.JustIntonationPitch, ...],
+        pitch_index_array: np.ndarray,
+        harmonicity_array: np.ndarray,
+        ambitus_index_array: np.ndarray,
+        interval_pair_index_array: np.ndarray,
+        fingering_tuple_tuple: typing.Optional[tuple] = None,
+    ):
+        self.pitch_table = pitch_table
+        self.pitch_index_array = pitch_index_array
+        self.harmonicity_array = harmonicity_array
+        self.ambitus_index_array = ambitus_index_array
+        self.interval_pair_index_array = interval_pair_index_array
+        self.fingering_tuple_tuple = fingering_tuple_tuple
+
+    @classmethod
+    def from_chord_sequence(cls, chord_sequence: typing.Iterable[Chord]) -> ChordArray:
+        """Make :class:`ChordArray` from chords (or a chord iterator)."""
+        exponent_tuple_to_index = {}
+        pitch_list = []
+
+        def get_index(p):
+            try:
+                return exponent_tuple_to_index[p.exponent_tuple]
+            except KeyError:
+                index = exponent_tuple_to_index[p.exponent_tuple] = len(pitch_list)
+                pitch_list.append(p)
+                return index
+
+        pitch_index_list, harmonicity_list, ambitus_index_list = [], [], []
+        interval_pair_index_list, fingering_tuple_list = [], []
+        for chord in chord_sequence:
+            pitch_index_tuple = tuple(map(get_index, chord.pitch_tuple))
+            pitch_index_list.append(pitch_index_tuple)
+            harmonicity_list.append(chord.harmonicity)
+            ambitus_index_list.append(
+                (
+                    get_index(chord.ambitus.minima_pitch),
+                    get_index(chord.ambitus.maxima_pitch),
+                )
+            )
+            # Each interval is the difference of two pitches of the chord.
+            interval_to_pair = {}
+            for (index0, p0), (index1, p1) in itertools.permutations(
+                zip(pitch_index_tuple, chord.pitch_tuple), 2
+            ):
+                interval_to_pair.setdefault(
+                    _interval(p0, p1).exponent_tuple, (index0, index1)
+                )
+            interval_pair_index_list.append(
+                tuple(
+                    interval_to_pair[interval.exponent_tuple]
+                    for interval in chord.interval_tuple
+                )
+            )
+            fingering_tuple_list.append(chord.fingering_tuple)
+
+        if any(fingering_tuple is not None for fingering_tuple in fingering_tuple_list):
+            fingering_tuple_tuple = tuple(fingering_tuple_list)
+        else:
+            fingering_tuple_tuple = None
+        dtype = _get_index_dtype(len(pitch_list))
+        return cls(
+            tuple(pitch_list),
+            _make_index_array(pitch_index_list, dtype),
+            np.array(harmonicity_list, dtype=np.float64),
+            np.array(ambitus_index_list, dtype=dtype).reshape(-1, 2),
+            _make_index_array(interval_pair_index_list, dtype, (2,)),
+            fingering_tuple_tuple,
+        )
+
+    def __len__(self) -> int:
+        return len(self.harmonicity_array)
+
+    def __iter__(self) -> typing.Iterator[Chord]:
+        for index in range(len(self)):
+            yield self._get_chord(index)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            if not -len(self) <= key < len(self):
+                raise IndexError("ChordArray index out of range")
+            return self._get_chord(int(key) % len(self))
+        if self.fingering_tuple_tuple is not None:
+            fingering_tuple_tuple = tuple(
+                self.fingering_tuple_tuple[index] for index in np.arange(len(self))[key]
+            )
+        else:
+            fingering_tuple_tuple = None
+        return type(self)(
+            self.pitch_table,
+            self.pitch_index_array[key],
+            self.harmonicity_array[key],
+            self.ambitus_index_array[key],
+            self.interval_pair_index_array[key],
+            fingering_tuple_tuple,
+        )
+
+    @property
+    def pitch_count_array(self) -> np.ndarray:
+        """Number of pitches of each chord."""
+        return (self.pitch_index_array >= 0).sum(axis=1)
+
+    @property
+    def ambitus_frequency_array(self) -> np.ndarray:
+        """Frequency of minima and maxima pitch of each chord."""
+        frequency_array = np.array([p.frequency for p in self.pitch_table])
+        return frequency_array[self.ambitus_index_array]
+
+    def sort(self, reverse: bool = True) -> ChordArray:
+        """Sort chords by their harmonicity (by default the highest first).
+
+        Chords with the same harmonicity keep their order.
+        """
+        if reverse:
+            index_array = np.argsort(-self.harmonicity_array, kind="stable")
+        else:
+            index_array = np.argsort(self.harmonicity_array, kind="stable")
+        return self[index_array]
+
+    def _get_chord(self, index: int) -> Chord:
+        pitch_index_array = self.pitch_index_array[index]
+        pitch_tuple = self._get_pitch_tuple(pitch_index_array)
+        minima_index, maxima_index = self.ambitus_index_array[index]
+        return Chord(
+            pitch_tuple,
+            len(pitch_tuple),
+            float(self.harmonicity_array[index]),
+            music_parameters.OctaveAmbitus(
+                self.pitch_table[minima_index], self.pitch_table[maxima_index]
+            ),
+            (
+                None
+                if self.fingering_tuple_tuple is None
+                else self.fingering_tuple_tuple[index]
+            ),
+            tuple(
+                _interval(self.pitch_table[index0], self.pitch_table[index1])
+                for index0, index1 in self.interval_pair_index_array[index]
+                if index0 >= 0
+            ),
+            tuple(_interval(p1, p0) for p0, p1 in zip(pitch_tuple, pitch_tuple[1:])),
+        )
+
+    def _get_pitch_tuple(self, index_array: np.ndarray) -> tuple:
+        return tuple(self.pitch_table[index] for index in index_array if index >= 0)
+
+
+def _get_index_dtype(pitch_count: int) -> np.dtype:
+    # Smallest signed integer type which fits all indices and -1.
+    return np.min_scalar_type(-max(pitch_count, 1))
+
+
+def _make_index_array(
+    index_tuple_list: list[tuple], dtype: np.dtype, item_shape: tuple[int, ...] = ()
+) -> np.ndarray:
+    width = max(map(len, index_tuple_list), default=0)
+    index_array = np.full((len(index_tuple_list), width) + item_shape, -1, dtype=dtype)
+    for row, index_tuple in enumerate(index_tuple_list):
+        index_array[row, : len(index_tuple)] = index_tuple
+    return index_array
+
+
+def find_chord_array(*args, **kwargs) -> ChordArray:
+    """Same as :func:`find_chord_iterator`, but return a :class:`ChordArray`."""
+    return ChordArray.from_chord_sequence(find_chord_iterator(*args, **kwargs))
@@ -1,18 +1,34 @@
 import collections
+import heapq
 import itertools
+import math
+import os
+import pickle
+import tempfile
 import typing
 
+import numpy as np
 import ranges
 
 from mutwo import core_utilities
 from mutwo import music_parameters
 
+from .caches import CacheInfo
+from .caches import LRUCache
+
 
 __all__ = (
     "Chord",
     "ChordDifference",
+    "ChordTransitionMatrix",
     "find_chord_tuple",
+    "find_chord_iterator",
     "make_chord_difference_tuple",
+    "get_cache_info",
+    "get_cache_state",
+    "update_cache_state",
+    "save_cache",
+    "load_cache",
 )
 
 
@@ -45,16 +61,99 @@ ChordDifference = collections.namedtuple(
 )
 
 
+class ChordTransitionMatrix(object):
+    """Properties of all possible chord sequences between two chord sets.
+
+    :param chord_tuple0: The chords which are left.
+    :type chord_tuple0: tuple[Chord, ...]
+    :param chord_tuple1: The chords which are entered.
+    :type chord_tuple1: tuple[Chord, ...]
+
+    The chords are encoded as rows of a matrix over the pitches of both
+    chord sets. So the number of common pitches, the size of the union
+    and the harmonicity delta of all chord pairs are computed at once as
+    matrices with one row for each chord of ``chord_tuple0`` and one
+    column for each chord of ``chord_tuple1``. :class:`ChordDifference`
+    objects are only made for the chord pairs which are selected.
+
+    **Example:**
+
+    >>> transition_matrix = ChordTransitionMatrix(chord_tuple0, chord_tuple1)
+    >>> chord_difference_tuple = transition_matrix.select(
+    ...     transition_matrix.intersection_count_matrix >= 2
+    ... )
+    """
+
+    def __init__(
+        self, chord_tuple0: tuple[Chord, ...], chord_tuple1: tuple[Chord, ...]
+    ):
+        self.chord_tuple0 = tuple(chord_tuple0)
+        self.chord_tuple1 = tuple(chord_tuple1)
+        ratio_to_index = {}
+        for chord in self.chord_tuple0 + self.chord_tuple1:
+            for p in chord.pitch_tuple:
+                ratio_to_index.setdefault(p.ratio, len(ratio_to_index))
+
+        def make_pitch_matrix(chord_tuple):
+            pitch_matrix = np.zeros(
+                (len(chord_tuple), len(ratio_to_index)), dtype=np.int32
+            )
+            for chord_index, chord in enumerate(chord_tuple):
+                for p in chord.pitch_tuple:
+                    pitch_matrix[chord_index, ratio_to_index[p.ratio]] = 1
+            return pitch_matrix
+
+        pitch_matrix0 = make_pitch_matrix(self.chord_tuple0)
+        pitch_matrix1 = make_pitch_matrix(self.chord_tuple1)
+        self.intersection_count_matrix = pitch_matrix0 @ pitch_matrix1.T
+        self.union_count_matrix = (
+            pitch_matrix0.sum(axis=1)[:, np.newaxis]
+            + pitch_matrix1.sum(axis=1)[np.newaxis, :]
+            - self.intersection_count_matrix
+        )
+        self.harmonicity_matrix = (
+            np.array([chord.harmonicity for chord in self.chord_tuple1], dtype=float)[
+                np.newaxis, :
+            ]
+            - np.array([chord.harmonicity for chord in self.chord_tuple0], dtype=float)[
+                :, np.newaxis
+            ]
+        )
+
+    def __len__(self) -> int:
+        return len(self.chord_tuple0) * len(self.chord_tuple1)
+
+    def __getitem__(self, index_pair: tuple[int, int]) -> ChordDifference:
+        index0, index1 = index_pair
+        return _make_chord_difference(
+            self.chord_tuple0[index0], self.chord_tuple1[index1]
+        )
+
+    def __iter__(self) -> typing.Iterator[ChordDifference]:
+        for chord0, chord1 in itertools.product(self.chord_tuple0, self.chord_tuple1):
+            yield _make_chord_difference(chord0, chord1)
+
+    def select(self, mask: np.ndarray) -> tuple[ChordDifference, ...]:
+        """Make chord differences of all pairs where ``mask`` is ``True``.
+
+        :param mask: Boolean matrix with the same shape as the property
+            matrices.
+        :type mask: np.ndarray
+        """
+        return tuple(self[index0, index1] for index0, index1 in zip(*np.nonzero(mask)))
+
+
 def make_chord_difference_tuple(
     chord_tuple0: tuple[Chord, ...],
     chord_tuple1: tuple[Chord, ...],
 ) -> tuple[tuple[Chord, Chord, ChordDifference], ...]:
-    """Compute properties of all possible chord sequences between two chord sets"""
+    """Compute properties of all possible chord sequences between two chord sets
+
+    Use :class:`ChordTransitionMatrix` to only compute the properties of
+    selected chord sequences.
+    """
 
-    chord_difference_list = []
-    for chord0, chord1 in itertools.product(chord_tuple0, chord_tuple1):
-        chord_difference_list.append(_make_chord_difference(chord0, chord1))
-    return tuple(chord_difference_list)
+    return tuple(ChordTransitionMatrix(chord_tuple0, chord_tuple1))
 
 
 def _make_chord_difference(chord0: Chord, chord1: Chord):
@@ -102,10 +201,192 @@ def find_chord_tuple(
     instrument: typing.Optional[music_parameters.abc.Instrument] = None,
     min_interval: typing.Optional[music_parameters.abc.PitchInterval] = None,
     max_interval: typing.Optional[music_parameters.abc.PitchInterval] = None,
+    backend: str = "numpy",
+    top_k: typing.Optional[int] = None,
     **kwargs,
 ) -> tuple[Chord, ...]:
-    """Create a tuple of chords which fulfill specific constraints"""
+    """Create a tuple of chords which fulfill specific constraints
 
+    With ``backend="numpy"`` the intervals and harmonicities of all
+    pitch pairs are computed only once. Then all combinations of the
+    same size are filtered in batches by array operations, before the
+    remaining combinations are checked (and turned into chords) in the
+    same way as with ``backend="python"``.
+
+    With ``backend="branch_and_bound"`` chords are built pitch by pitch.
+    A partial chord is dropped as soon as one of its intervals is out
+    of range or if its average harmonicity can't reach the harmonicity
+    range anymore. This is the fastest backend for big pitch sets and
+    chords with many pitches.
+
+    ``backend`` can also be a function which gets ``picked_pitch_tuple``,
+    the valid pitches, the number of pitches which should be added and
+    the harmonicity and interval limits and which returns an iterator
+    over the pitch combinations which should be checked (a chord index,
+    see :mod:`project.chords`). It needs to return all valid combinations
+    in the same order as ``itertools.combinations``.
+
+    All backends return the same chords in the same order.
+
+    If ``top_k`` is set, only the ``top_k`` chords with the highest
+    harmonicity are returned (sorted from highest to lowest harmonicity,
+    chords with the same harmonicity keep their order). With
+    ``backend="branch_and_bound"`` the search then also skips all
+    partial chords which can't beat the current top chords.
+
+    See :func:`find_chord_iterator` for a lazy variant.
+    """
+
+    if top_k is None:
+        order = "pitch_count"
+    else:
+        order = "harmonicity"
+    return tuple(
+        find_chord_iterator(
+            picked_pitch_tuple,
+            pitch_tuple,
+            pitch_count_range,
+            min_harmonicity,
+            max_harmonicity,
+            ambitus,
+            instrument,
+            min_interval,
+            max_interval,
+            backend,
+            order=order,
+            max_chord_count=top_k,
+        )
+    )
+
+
+def find_chord_iterator(
+    picked_pitch_tuple: tuple[music_parameters.JustIntonationPitch, ...] = tuple([]),
+    pitch_tuple: tuple[music_parameters.JustIntonationPitch, ...] = tuple([]),
+    pitch_count_range: ranges.Range = ranges.Range(1, 3),
+    min_harmonicity: typing.Optional[float] = music_parameters.JustIntonationPitch(
+        "7/4"
+    ).harmonicity_simplified_barlow,
+    max_harmonicity: typing.Optional[float] = None,
+    ambitus: music_parameters.abc.PitchAmbitus = music_parameters.OctaveAmbitus(
+        music_parameters.JustIntonationPitch("1/4"),
+        music_parameters.JustIntonationPitch("4/1"),
+    ),
+    instrument: typing.Optional[music_parameters.abc.Instrument] = None,
+    min_interval: typing.Optional[music_parameters.abc.PitchInterval] = None,
+    max_interval: typing.Optional[music_parameters.abc.PitchInterval] = None,
+    backend: str = "numpy",
+    order: str = "pitch_count",
+    max_chord_count: typing.Optional[int] = None,
+    seed: typing.Optional[int] = None,
+    **kwargs,
+) -> typing.Iterator[Chord]:
+    """Yield chords which fulfill specific constraints
+
+    Same as :func:`find_chord_tuple`, but chords are made when they
+    are needed. ``order`` can be
+
+    - ``"pitch_count"``: same order as :func:`find_chord_tuple` (chords
+      with fewer pitches first). Chords are searched while iterating, so
+      the first chord is found fast and memory stays flat.
+    - ``"harmonicity"``: chords with the highest harmonicity first. This
+      needs all chords, or only ``max_chord_count`` chords at once if
+      it's set (see ``top_k`` of :func:`find_chord_tuple`).
+    - ``"random"``: random order, which only depends on ``seed``. This
+      needs all chords, or only ``max_chord_count`` chords at once if
+      it's set (then a random sample of all chords is returned).
+
+    If ``max_chord_count`` is set, at most ``max_chord_count`` chords
+    are returned.
+    """
+
+    chord_iterator_argument_tuple = (
+        picked_pitch_tuple,
+        pitch_tuple,
+        pitch_count_range,
+        min_harmonicity,
+        max_harmonicity,
+        ambitus,
+        instrument,
+        min_interval,
+        max_interval,
+        backend,
+    )
+    match order:
+        case "pitch_count":
+            yield from itertools.islice(
+                _iterate_chord(*chord_iterator_argument_tuple), max_chord_count
+            )
+        case "harmonicity":
+            chord_iterator = _iterate_chord(*chord_iterator_argument_tuple)
+            if max_chord_count is None:
+                yield from sorted(
+                    chord_iterator, key=lambda chord: chord.harmonicity, reverse=True
+                )
+                return
+
+            # (harmonicity, -chord index, chord) of the best chords
+            top_chord_heap = []
+
+            def get_min_harmonicity():
+                if len(top_chord_heap) < max_chord_count:
+                    return min_harmonicity
+                # Partial chords which can't beat the worst top chord
+                # can be skipped.
+                top_harmonicity = top_chord_heap[0][0]
+                if min_harmonicity and min_harmonicity > top_harmonicity:
+                    return min_harmonicity
+                return top_harmonicity
+
+            for chord_index, chord in enumerate(
+                _iterate_chord(*chord_iterator_argument_tuple, get_min_harmonicity)
+            ):
+                item = (chord.harmonicity, -chord_index, chord)
+                if len(top_chord_heap) < max_chord_count:
+                    heapq.heappush(top_chord_heap, item)
+                else:
+                    heapq.heappushpop(top_chord_heap, item)
+            yield from (
+                chord
+                for _, _, chord in sorted(
+                    top_chord_heap, key=lambda item: item[:2], reverse=True
+                )
+            )
+        case "random":
+            random = np.random.default_rng(seed)
+            chord_iterator = _iterate_chord(*chord_iterator_argument_tuple)
+            if max_chord_count is None:
+                chord_list = list(chord_iterator)
+            else:
+                # Reservoir sampling: each chord has the same chance to
+                # be part of the sample.
+                chord_list = []
+                for chord_index, chord in enumerate(chord_iterator):
+                    if chord_index < max_chord_count:
+                        chord_list.append(chord)
+                    elif (
+                        index := random.integers(0, chord_index + 1)
+                    ) < max_chord_count:
+                        chord_list[index] = chord
+            yield from (
+                chord_list[index] for index in random.permutation(len(chord_list))
+            )
+        case _:
+            raise ValueError(f"Unknown order '{order}'")
+
+
+def _iterate_chord(
+    picked_pitch_tuple,
+    pitch_tuple,
+    pitch_count_range,
+    min_harmonicity,
+    max_harmonicity,
+    ambitus,
+    instrument,
+    min_interval,
+    max_interval,
+    backend,
+    get_min_harmonicity=None,
+) -> typing.Iterator[Chord]:
     pitch_tuple = tuple(sorted(core_utilities.uniqify_sequence(pitch_tuple)))
 
     valid_pitch_tuple = tuple(
@@ -113,10 +394,63 @@ def find_chord_tuple(
     )
     picked_pitch_count = len(picked_pitch_tuple)
 
-    chord_list = []
+    match backend:
+        case "python":
+
+            def get_partner_tuple_iterator(difference):
+                return itertools.combinations(valid_pitch_tuple, difference)
+
+        case "numpy":
+            pair_matrix_tuple = _make_pair_matrix_tuple(
+                picked_pitch_tuple, valid_pitch_tuple
+            )
+
+            def get_partner_tuple_iterator(difference):
+                return _filter_partner_tuple(
+                    valid_pitch_tuple,
+                    difference,
+                    pair_matrix_tuple,
+                    min_harmonicity,
+                    max_harmonicity,
+                    min_interval,
+                    max_interval,
+                )
+
+        case "branch_and_bound":
+            pair_matrix_tuple = _make_pair_matrix_tuple(
+                picked_pitch_tuple, valid_pitch_tuple
+            )
+
+            def get_partner_tuple_iterator(difference):
+                return _search_partner_tuple(
+                    valid_pitch_tuple,
+                    difference,
+                    pair_matrix_tuple,
+                    get_min_harmonicity or (lambda: min_harmonicity),
+                    max_harmonicity,
+                    min_interval,
+                    max_interval,
+                )
+
+        case _ if callable(backend):
+
+            def get_partner_tuple_iterator(difference):
+                return backend(
+                    picked_pitch_tuple,
+                    valid_pitch_tuple,
+                    difference,
+                    min_harmonicity,
+                    max_harmonicity,
+                    min_interval,
+                    max_interval,
+                )
+
+        case _:
+            raise ValueError(f"Unknown backend '{backend}'")
+
     for pitch_count in range(pitch_count_range.start, pitch_count_range.end):
         if (difference := pitch_count - picked_pitch_count) >= 0:
-            for partner_tuple in itertools.combinations(valid_pitch_tuple, difference):
+            for partner_tuple in get_partner_tuple_iterator(difference):
                 if chord := _make_chord(
                     picked_pitch_tuple,
                     pitch_count,
@@ -127,9 +461,237 @@ def find_chord_tuple(
                     min_interval,
                     max_interval,
                 ):
-                    chord_list.append(chord)
+                    yield chord
+
+
+# How many combinations are filtered at once.
+_BATCH_SIZE = 2**14
+
+# The numpy and branch and bound backends compute the average
+# harmonicity in a different order than '_make_chord', so the results may differ in the last
+# digits. Therefore combinations close to the limits are kept and
+# '_make_chord' decides.
+_HARMONICITY_TOLERANCE = 1e-9
+
+
+def _make_pair_matrix_tuple(
+    picked_pitch_tuple, valid_pitch_tuple
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Harmonicity and cents of all pitch pairs which can be part of a chord.
+
+    Returns (harmonicity, cents) of (picked pitch, valid pitch) pairs
+    and of (valid pitch, valid pitch) pairs.
+    """
+
+    def make(pitch_tuple0, pitch_tuple1, is_combination):
+        harmonicity_matrix = np.zeros((len(pitch_tuple0), len(pitch_tuple1)))
+        cents_matrix = np.zeros((len(pitch_tuple0), len(pitch_tuple1)))
+        for index0, p0 in enumerate(pitch_tuple0):
+            for index1, p1 in enumerate(pitch_tuple1):
+                # Only pairs in the order of 'itertools.combinations'
+                if is_combination and index1 <= index0:
+                    continue
+                interval = _interval(p0, p1)
+                harmonicity_matrix[index0, index1] = _harmonicity(interval)
+                cents_matrix[index0, index1] = abs(interval.interval)
+        return harmonicity_matrix, cents_matrix
+
+    return make(picked_pitch_tuple, valid_pitch_tuple, False) + make(
+        valid_pitch_tuple, valid_pitch_tuple, True
+    )
+
+
+def _filter_partner_tuple(
+    valid_pitch_tuple,
+    difference,
+    pair_matrix_tuple,
+    min_harmonicity,
+    max_harmonicity,
+    min_interval,
+    max_interval,
+) -> typing.Iterator[tuple[music_parameters.JustIntonationPitch, ...]]:
+    """Yield combinations of valid pitches which may become a chord.
+
+    All other combinations would be rejected by :func:`_make_chord`.
+    """
+    (
+        picked_harmonicity_matrix,
+        picked_cents_matrix,
+        harmonicity_matrix,
+        cents_matrix,
+    ) = pair_matrix_tuple
+    combination_iterator = itertools.combinations(
+        range(len(valid_pitch_tuple)), difference
+    )
+    picked_pitch_count = picked_harmonicity_matrix.shape[0]
+    column_pair_tuple = tuple(itertools.combinations(range(difference), 2))
+    if not (pair_count := picked_pitch_count * difference + len(column_pair_tuple)):
+        # Nothing to filter (and nothing to compute the average of).
+        for index_tuple in combination_iterator:
+            yield tuple(valid_pitch_tuple[index] for index in index_tuple)
+        return
+
+    column_array0, column_array1 = (
+        np.array(column_tuple, dtype=np.intp).reshape(-1)
+        for column_tuple in (
+            tuple(c0 for c0, _ in column_pair_tuple),
+            tuple(c1 for _, c1 in column_pair_tuple),
+        )
+    )
+
+    def get_pair_array(index_array, picked_matrix, matrix):
+        # One row for each combination, one column for each pitch pair.
+        return np.concatenate(
+            (
+                picked_matrix[:, index_array]
+                .transpose(1, 0, 2)
+                .reshape(len(index_array), picked_pitch_count * difference),
+                matrix[index_array[:, column_array0], index_array[:, column_array1]],
+            ),
+            axis=1,
+        )
+
+    while index_tuple_tuple := tuple(
+        itertools.islice(combination_iterator, _BATCH_SIZE)
+    ):
+        index_array = np.array(index_tuple_tuple, dtype=np.intp)
+        harmonicity_array = get_pair_array(
+            index_array, picked_harmonicity_matrix, harmonicity_matrix
+        )
+        cents_array = get_pair_array(index_array, picked_cents_matrix, cents_matrix)
+
+        is_valid_array = np.ones(len(index_array), dtype=bool)
+        if min_interval:
+            is_valid_array &= (cents_array >= min_interval.interval).all(axis=1)
+        if max_interval:
+            is_valid_array &= (cents_array <= max_interval.interval).all(axis=1)
+        harmonicity = harmonicity_array.sum(axis=1) / pair_count
+        # 'nan' can't be compared, let '_make_chord' decide.
+        is_finite_array = np.isfinite(harmonicity)
+        if max_harmonicity:
+            is_valid_array &= ~is_finite_array | (
+                harmonicity <= max_harmonicity + _HARMONICITY_TOLERANCE
+            )
+        if min_harmonicity:
+            is_valid_array &= ~is_finite_array | (
+                harmonicity >= min_harmonicity - _HARMONICITY_TOLERANCE
+            )
+
+        for index_tuple in index_array[is_valid_array]:
+            yield tuple(valid_pitch_tuple[index] for index in index_tuple)
+
+
+def _search_partner_tuple(
+    valid_pitch_tuple,
+    difference,
+    pair_matrix_tuple,
+    get_min_harmonicity,
+    max_harmonicity,
+    min_interval,
+    max_interval,
+) -> typing.Iterator[tuple[music_parameters.JustIntonationPitch, ...]]:
+    """Yield combinations of valid pitches which may become a chord.
+
+    Combinations are built by a depth first search and yielded in the
+    same order as by ``itertools.combinations``. ``get_min_harmonicity``
+    is called for each partial chord, so the limit can rise during the
+    search.
+    """
+    (
+        picked_harmonicity_matrix,
+        picked_cents_matrix,
+        harmonicity_matrix,
+        cents_matrix,
+    ) = (matrix.tolist() for matrix in pair_matrix_tuple)
+    picked_pitch_count = len(picked_harmonicity_matrix)
+    valid_pitch_count = len(valid_pitch_tuple)
+    pair_count = picked_pitch_count * difference + difference * (difference - 1) // 2
+    if not pair_count:
+        # Nothing to prune (and nothing to compute the average of).
+        yield from itertools.combinations(valid_pitch_tuple, difference)
+        return
+
+    min_cents = min_interval.interval if min_interval else None
+    max_cents = max_interval.interval if max_interval else None
+
+    # All pairs which are still missing in a partial chord contain at
+    # least one pitch which comes after the last pitch of the partial
+    # chord. So the harmonicity of those pairs lies between the minimum
+    # and maximum harmonicity of all pairs which end at this or at a
+    # later pitch.
+    column_list = [
+        [row[index] for row in picked_harmonicity_matrix]
+        + [row[index] for row in harmonicity_matrix[:index]]
+        for index in range(valid_pitch_count)
+    ]
+    is_bounded = all(math.isfinite(h) for column in column_list for h in column)
+    max_harmonicity_list = [-math.inf] * (valid_pitch_count + 1)
+    min_harmonicity_list = [math.inf] * (valid_pitch_count + 1)
+    for index in reversed(range(valid_pitch_count)):
+        max_harmonicity_list[index] = max(
+            column_list[index] + [max_harmonicity_list[index + 1]]
+        )
+        min_harmonicity_list[index] = min(
+            column_list[index] + [min_harmonicity_list[index + 1]]
+        )
+
+    index_list = []
+
+    def search(start, harmonicity_sum, current_pair_count):
+        if len(index_list) == difference:
+            yield tuple(valid_pitch_tuple[index] for index in index_list)
+            return
+        missing_pitch_count = difference - len(index_list) - 1
+        for index in range(start, valid_pitch_count - missing_pitch_count):
+            new_harmonicity_sum = harmonicity_sum
+            for cents, harmonicity in itertools.chain(
+                (
+                    (cents_row[index], harmonicity_row[index])
+                    for cents_row, harmonicity_row in zip(
+                        picked_cents_matrix, picked_harmonicity_matrix
+                    )
+                ),
+                (
+                    (cents_matrix[i][index], harmonicity_matrix[i][index])
+                    for i in index_list
+                ),
+            ):
+                if (min_cents is not None and min_cents > cents) or (
+                    max_cents is not None and max_cents < cents
+                ):
+                    break
+                new_harmonicity_sum += harmonicity
+            else:
+                new_pair_count = (
+                    current_pair_count + picked_pitch_count + len(index_list)
+                )
+                if is_bounded:
+                    missing_pair_count = pair_count - new_pair_count
+                    max_average = (
+                        new_harmonicity_sum
+                        + missing_pair_count * max_harmonicity_list[index + 1]
+                        if missing_pair_count
+                        else new_harmonicity_sum
+                    ) / pair_count
+                    min_average = (
+                        new_harmonicity_sum
+                        + missing_pair_count * min_harmonicity_list[index + 1]
+                        if missing_pair_count
+                        else new_harmonicity_sum
+                    ) / pair_count
+                    if (min_harmonicity := get_min_harmonicity()) and (
+                        max_average < min_harmonicity - _HARMONICITY_TOLERANCE
+                    ):
+                        continue
+                    if max_harmonicity and (
+                        min_average > max_harmonicity + _HARMONICITY_TOLERANCE
+                    ):
+                        continue
+                index_list.append(index)
+                yield from search(index + 1, new_harmonicity_sum, new_pair_count)
+                index_list.pop()
 
-    return tuple(chord_list)
+    yield from search(0, 0, 0)
 
 
 def _make_chord(
@@ -192,23 +754,83 @@ def _make_chord(
 
 # Catch intervals for faster computation
 def _interval(p0, p1):
-    key = (p0.exponent_tuple, p1.exponent_tuple)
-    try:
-        return PITCH_TUPLE_TO_INTERVAL[key]
-    except KeyError:
-        i = PITCH_TUPLE_TO_INTERVAL[key] = p0 - p1
-        return i
+    return PITCH_TUPLE_TO_INTERVAL.get(
+        (p0.exponent_tuple, p1.exponent_tuple), lambda: p0 - p1
+    )
 
 
 # Catch harmonicity for faster computation
 def _harmonicity(p):
-    key = p.exponent_tuple
+    return INTERVAL_TO_HARMONICITY.get(
+        p.exponent_tuple, lambda: p.harmonicity_simplified_barlow
+    )
+
+
+PITCH_TUPLE_TO_INTERVAL = LRUCache(max_size=2**16)
+INTERVAL_TO_HARMONICITY = LRUCache(max_size=2**16)
+
+
+def get_cache_info() -> dict[str, CacheInfo]:
+    """Hit and miss counts of the interval and harmonicity caches."""
+    return dict(
+        PITCH_TUPLE_TO_INTERVAL=PITCH_TUPLE_TO_INTERVAL.info(),
+        INTERVAL_TO_HARMONICITY=INTERVAL_TO_HARMONICITY.info(),
+    )
+
+
+def get_cache_state() -> dict[str, tuple]:
+    """Items of the interval and harmonicity caches.
+
+    The state can be pickled and passed to other processes and be
+    added there with :func:`update_cache_state`, e.g. for process pools:
+
+    >>> concurrent.futures.ProcessPoolExecutor(
+    ...     initializer=update_cache_state, initargs=(get_cache_state(),)
+    ... )
+    """
+    # Only the exponents of the intervals are kept: they are much
+    # smaller (and faster to pickle) than the pitches themselves.
+    return dict(
+        PITCH_TUPLE_TO_INTERVAL=tuple(
+            (key, interval.exponent_tuple)
+            for key, interval in PITCH_TUPLE_TO_INTERVAL.items()
+        ),
+        INTERVAL_TO_HARMONICITY=INTERVAL_TO_HARMONICITY.items(),
+    )
+
+
+def update_cache_state(cache_state: dict[str, tuple]):
+    """Add items of :func:`get_cache_state` to the caches."""
+    PITCH_TUPLE_TO_INTERVAL.update(
+        (key, music_parameters.JustIntonationPitch(list(exponent_tuple)))
+        for key, exponent_tuple in cache_state["PITCH_TUPLE_TO_INTERVAL"]
+    )
+    INTERVAL_TO_HARMONICITY.update(cache_state["INTERVAL_TO_HARMONICITY"])
+
+
+def save_cache(path: str):
+    """Save interval and harmonicity caches, see :func:`load_cache`."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary_path = tempfile.mkstemp(dir=directory)
     try:
-        return INTERVAL_TO_HARMONICITY[key]
-    except KeyError:
-        h = INTERVAL_TO_HARMONICITY[key] = p.harmonicity_simplified_barlow
-        return h
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(get_cache_state(), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
 
 
-PITCH_TUPLE_TO_INTERVAL = {}
-INTERVAL_TO_HARMONICITY = {}
+def load_cache(path: str) -> bool:
+    """Warm up interval and harmonicity caches with a saved state.
+
+    Returns ``False`` if there is no readable state at ``path``.
+    """
+    try:
+        with open(path, "rb") as f:
+            cache_state = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return False
+    update_cache_state(cache_state)
+    return True
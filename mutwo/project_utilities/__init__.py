@@ -1,11 +1,18 @@
 import ranges
 
 from mutwo import core_events
+from mutwo import core_parameters
+from mutwo import core_utilities
 from mutwo import music_events
 from mutwo import music_parameters
 
 
-__all__ = ("split_harp", "get_ranges")
+__all__ = (
+    "split_harp",
+    "get_ranges",
+    "get_duration_function",
+    "get_scaled_absolute_time_tuple_and_duration",
+)
 
 
 def split_harp(
@@ -65,3 +72,50 @@ def get_ranges(needed_duration, duration, balance):
     right = duration - right
     # return ranges.Range(left, left * 0.01), ranges.Range(right * 0.99, right)
     return left, right
+
+
+def get_duration_function(old_duration, duration, event_count):
+    """Same scaling as setting the duration of a complex event.
+
+    Returns what :class:`mutwo.core_events.abc.ComplexEvent` passes to
+    ``set_parameter("duration", ...)`` when its duration is set: either
+    a function or (if the old duration is 0) a constant duration.
+    """
+    duration = core_events.configurations.UNKNOWN_OBJECT_TO_DURATION(duration)
+    if old_duration != 0:
+
+        def f(event_duration):
+            return core_utilities.scale(event_duration, 0, old_duration, 0, duration)
+
+        return f
+    return duration / event_count
+
+
+def get_scaled_absolute_time_tuple_and_duration(
+    sequential_event: core_events.SequentialEvent, duration_function
+):
+    """Absolute times of a sequential event with scaled durations.
+
+    This is a read-only view: it returns the same as
+    ``sequential_event.set_parameter("duration", duration_function,
+    mutate=False)._absolute_time_tuple_and_duration``, but without
+    copying the event.
+    """
+
+    def get_duration(event):
+        if isinstance(event, core_events.abc.ComplexEvent):
+            return event.set_parameter(
+                "duration", duration_function, mutate=False
+            ).duration
+        if callable(duration_function):
+            d = duration_function(event.duration)
+        else:
+            d = duration_function
+        return core_events.configurations.UNKNOWN_OBJECT_TO_DURATION(d)
+
+    absolute_time_tuple = tuple(
+        core_utilities.accumulate_from_n(
+            map(get_duration, sequential_event), core_parameters.DirectDuration(0)
+        )
+    )
+    return absolute_time_tuple[:-1], absolute_time_tuple[-1]
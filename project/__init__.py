@@ -1,8 +1,16 @@
+# 'project.entries' isn't imported here: importing it registers all
+# diary entries (and opens the diary storage). Only clock generation
+# needs the entries, rendering a clock bundle doesn't.
 from . import patches
 from . import constants
-from . import entries
 from . import render
 from . import clock_trees
 from . import clocks
+from . import cache
+from . import planner
+from . import profiler
+from . import timelines
+from . import bundles
+from . import chords
 
 del patches
@@ -0,0 +1,176 @@
+"""Hand generated clocks over to rendering.
+
+A clock bundle is one file which contains the clocks of some pages, so
+that rendering (notation, midi) doesn't need to generate the clocks and
+doesn't need the diary storage. Because rendering mutates the clocks,
+each page is stored as separate pickle: a :class:`ClockBundle` unpickles
+a fresh copy of a page each time it is accessed, so one bundle can be
+rendered several times (also in parallel processes).
+
+File layout:
+
+    MAGIC | header size (8 bytes, little endian) | JSON header | pages
+
+The header contains the page indices, offset and size of each page and
+some meta data (e.g. the cache key of each page). The file is memory
+mapped and a page is only read when it's accessed.
+"""
+
+import json
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import typing
+import zlib
+
+from mutwo import clock_interfaces
+
+MAGIC = b"CLKBNDL1"
+VERSION = 1
+
+BUNDLE_PATH = "builds/clocks.bundle"
+
+_HEADER_SIZE_FORMAT = "<Q"
+
+
+def write_bundle(
+    path: str,
+    clock_tuple: typing.Sequence[clock_interfaces.Clock],
+    page_index_tuple: typing.Optional[typing.Sequence[int]] = None,
+    compress: bool = True,
+    **meta,
+):
+    """Write clocks to a clock bundle.
+
+    :param path: Where the bundle is saved.
+    :type path: str
+    :param clock_tuple: The clocks which are saved.
+    :param page_index_tuple: The page index of each clock. By default
+        clocks are numbered from 0.
+    :param compress: If ``True`` each page is compressed with zlib.
+    :type compress: bool
+    :param meta: JSON serializable meta data (e.g. the cache keys of
+        the clocks), see :attr:`ClockBundle.meta`.
+    """
+    if page_index_tuple is None:
+        page_index_tuple = tuple(range(len(clock_tuple)))
+    assert len(page_index_tuple) == len(clock_tuple)
+
+    data_list = []
+    for clock in clock_tuple:
+        data = pickle.dumps(clock, protocol=pickle.HIGHEST_PROTOCOL)
+        if compress:
+            data = zlib.compress(data)
+        data_list.append(data)
+
+    page_list, offset = [], 0
+    for page_index, data in zip(page_index_tuple, data_list):
+        page_list.append(dict(index=page_index, offset=offset, size=len(data)))
+        offset += len(data)
+    header = json.dumps(
+        dict(version=VERSION, compress=compress, page_list=page_list, meta=meta)
+    ).encode()
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    # Write to a temporary file first, so that a crash never leaves
+    # a broken bundle behind.
+    fd, temporary_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack(_HEADER_SIZE_FORMAT, len(header)))
+            f.write(header)
+            for data in data_list:
+                f.write(data)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+class ClockBundle(object):
+    """Read clocks from a clock bundle.
+
+    :param path: Path of the bundle.
+    :type path: str
+
+    Pages are accessed by their page index (not by their position in
+    the bundle). Each access returns a new copy of the clock.
+
+    **Example:**
+
+    >>> with ClockBundle("builds/clocks.bundle") as bundle:
+    ...     clock_tuple = bundle.get_clock_tuple((0, 3))
+    """
+
+    def __init__(self, path: str = BUNDLE_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self._mmap[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"'{path}' isn't a clock bundle")
+            header_start = len(MAGIC) + struct.calcsize(_HEADER_SIZE_FORMAT)
+            (header_size,) = struct.unpack(
+                _HEADER_SIZE_FORMAT, self._mmap[len(MAGIC) : header_start]
+            )
+            header = json.loads(self._mmap[header_start : header_start + header_size])
+        except Exception:
+            self._mmap.close()
+            raise
+        if header["version"] != VERSION:
+            self._mmap.close()
+            raise ValueError(
+                f"Clock bundle '{path}' has version {header['version']}, "
+                f"but only version {VERSION} is supported"
+            )
+        self._data_start = header_start + header_size
+        self._compress = header["compress"]
+        self._page_index_to_page = {page["index"]: page for page in header["page_list"]}
+        self.meta = header["meta"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._page_index_to_page)
+
+    def __contains__(self, page_index: int) -> bool:
+        return page_index in self._page_index_to_page
+
+    def __getitem__(self, page_index: int) -> clock_interfaces.Clock:
+        page = self._page_index_to_page[page_index]
+        start = self._data_start + page["offset"]
+        data = self._mmap[start : start + page["size"]]
+        if self._compress:
+            data = zlib.decompress(data)
+        return pickle.loads(data)
+
+    @property
+    def page_index_tuple(self) -> tuple[int, ...]:
+        return tuple(self._page_index_to_page)
+
+    def get_clock_tuple(
+        self, page_index_tuple: typing.Optional[typing.Sequence[int]] = None
+    ) -> tuple[clock_interfaces.Clock, ...]:
+        """Load clocks of the given pages (by default of all pages).
+
+        :raises KeyError: If a page isn't part of the bundle.
+        """
+        if page_index_tuple is None:
+            page_index_tuple = self.page_index_tuple
+        for page_index in page_index_tuple:
+            if page_index not in self:
+                raise KeyError(
+                    f"Page {page_index} isn't part of clock bundle '{self.path}'"
+                )
+        return tuple(self[page_index] for page_index in page_index_tuple)
+
+    def close(self):
+        self._mmap.close()
@@ -0,0 +1,267 @@
+"""Content addressed on-disk caches of generated clocks and gatra.
+
+Each page of 10.2 is a :class:`mutwo.clock_interfaces.Clock`. Generating
+a clock is expensive (diary entries are evaluated, conflicts are resolved),
+but most rebuilds only touch notation or midi rendering. Therefore the
+generated clocks are pickled to 'builds/cache/clocks'. The file name of
+each pickled clock is the hash of everything which feeds the page: the
+poem line, the scale, the energy/part count branch, the seeds, the
+source code of all diary entries, the source code which generates
+clocks (including 'mutwo/project_*' and 'project/patches') and the
+installed versions of mutwo and abjad. If any of those changes, the
+page gets a new key and is generated again.
+
+The gatra of each scale family and their adjacency, which the gatra
+walker of the build uses (see :func:`main.scale_to_gatra_walker`), are
+cached in the same way in 'builds/cache/gatra-adjacencies', keyed by
+the interval ratios of the scale family.
+
+The interval and harmonicity caches of the chord search are saved to
+'builds/cache/chords.pickle' after each build, so that the next build starts
+with warm caches.
+"""
+
+import functools
+import glob
+import hashlib
+import importlib.metadata
+import os
+import pickle
+import tempfile
+import typing
+import zipfile
+
+import numpy as np
+
+CACHE_PATH = "builds/cache/clocks"
+GATRA_ADJACENCY_CACHE_PATH = "builds/cache/gatra-adjacencies"
+# Intervals and harmonicities of 'project_generators.find_chord_tuple'
+CHORD_CACHE_PATH = "builds/cache/chords.pickle"
+
+# Once the cache directory exceeds this size (in bytes), the least
+# recently used clocks are removed.
+MAX_CACHE_SIZE = 512 * 1024**2
+
+ENTRY_SOURCE_PATTERN = "project/entries/dynamic/**/*.py"
+
+# Not only the entries, but also the code which builds a clock around
+# the entries feeds each page.
+GENERATOR_SOURCE_PATH_TUPLE = (
+    "main.py",
+    "project/clocks.py",
+    "project/clock_trees.py",
+    "project/constants.py",
+    "project/timelines.py",
+)
+# The clocks are built with the mutwo extensions of the project (chord
+# search, gatra, converters, ...) and the patches of mutwo.
+GENERATOR_SOURCE_PATTERN_TUPLE = (
+    "mutwo/project_*/**/*.py",
+    "project/patches/**/*.py",
+)
+
+# Clocks are made of (and pickled with) objects of these libraries, so
+# a clock needs to be generated again after upgrading one of them.
+DEPENDENCY_NAME_PREFIX_TUPLE = ("mutwo", "abjad")
+
+# Code which creates the gatra and their adjacency.
+GATRA_ADJACENCY_SOURCE_PATH_TUPLE = ("mutwo/project_converters/modal.py",)
+
+
+def hash_path_tuple(path_tuple: typing.Sequence[str]) -> str:
+    """Hash content (and name) of all given files."""
+    h = hashlib.sha256()
+    for path in sorted(path_tuple):
+        h.update(path.encode())
+        with open(path, "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+@functools.cache
+def get_dependency_version_tuple() -> tuple[tuple[str, str], ...]:
+    """Name and version of all installed mutwo and abjad distributions."""
+    return tuple(
+        sorted(
+            set(
+                (distribution.metadata["Name"], distribution.version)
+                for distribution in importlib.metadata.distributions()
+                if (distribution.metadata["Name"] or "")
+                .lower()
+                .startswith(DEPENDENCY_NAME_PREFIX_TUPLE)
+            )
+        )
+    )
+
+
+def hash_generator_path_tuple(path_tuple: typing.Sequence[str]) -> str:
+    """Hash clock generation code and the versions of its libraries."""
+    h = hashlib.sha256(hash_path_tuple(path_tuple).encode())
+    h.update(repr(get_dependency_version_tuple()).encode())
+    return h.hexdigest()
+
+
+def get_entry_source_path_tuple() -> tuple[str, ...]:
+    return tuple(sorted(glob.glob(ENTRY_SOURCE_PATTERN, recursive=True)))
+
+
+def get_generator_source_path_tuple() -> tuple[str, ...]:
+    return GENERATOR_SOURCE_PATH_TUPLE + tuple(
+        sorted(
+            path
+            for pattern in GENERATOR_SOURCE_PATTERN_TUPLE
+            for path in glob.glob(pattern, recursive=True)
+        )
+    )
+
+
+def get_source_hash() -> str:
+    """Hash of all diary entries and of the clock generation code."""
+    return hash_generator_path_tuple(
+        get_entry_source_path_tuple() + get_generator_source_path_tuple()
+    )
+
+
+class ClockCache(object):
+    """Store pickled clocks in a size-bounded directory.
+
+    :param path: Directory where the pickled clocks are saved.
+    :type path: str
+    :param max_size: Size limit of the directory in bytes. If the
+        limit is exceeded, the least recently used clocks are removed.
+    :type max_size: int
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_size: int = MAX_CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def make_key(*key_part) -> str:
+        # All key parts need to have a stable 'repr', which is true
+        # for the tuples, strings, numbers and fractions we use.
+        return hashlib.sha256(repr(key_part).encode()).hexdigest()
+
+    def _key_to_path(self, key: str) -> str:
+        return f"{self.path}/{key}.pickle"
+
+    def get(self, key: str):
+        """Return cached clock or ``None`` if key isn't cached yet."""
+        path = self._key_to_path(key)
+        try:
+            with open(path, "rb") as f:
+                clock = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Broken file (e.g. an interrupted build) or a clock which
+            # can't be loaded with the installed libraries anymore:
+            # simply build it again.
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+        # Mark as recently used for the eviction.
+        os.utime(path)
+        return clock
+
+    def set(self, key: str, clock):
+        # Write to temporary file first, so that parallel builds
+        # never read a half written clock.
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(clock, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._key_to_path(key))
+
+    def evict(self):
+        """Remove least recently used clocks until cache fits into 'max_size'.
+
+        This needs to stat all clocks of the cache, so it should be
+        called once after all new clocks are set.
+        """
+        stat_list = []
+        for path in glob.glob(f"{self.path}/*.pickle"):
+            try:
+                stat_list.append((os.stat(path), path))
+            except FileNotFoundError:
+                pass
+        size = sum(stat.st_size for stat, _ in stat_list)
+        for stat, path in sorted(stat_list, key=lambda s: s[0].st_mtime):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= stat.st_size
+
+    def clear(self):
+        for path in glob.glob(f"{self.path}/*.pickle"):
+            os.remove(path)
+
+
+class GatraAdjacencyCache(object):
+    """Store gatra and their adjacency (see :class:`GatraAdjacency`).
+
+    The gatra and the index arrays of the adjacency are saved as NumPy
+    arrays, so loading them doesn't need to create any objects except
+    of the gatra tuples.
+
+    The files are written atomically, so parallel builds can share
+    the cache (two processes at worst both create the same adjacency).
+
+    :param path: Directory where the adjacencies are saved.
+    :type path: str
+    """
+
+    def __init__(self, path: str = GATRA_ADJACENCY_CACHE_PATH):
+        self.path = path
+        self._source_hash = None
+
+    @property
+    def source_hash(self) -> str:
+        if self._source_hash is None:
+            self._source_hash = hash_path_tuple(GATRA_ADJACENCY_SOURCE_PATH_TUPLE)
+        return self._source_hash
+
+    def _key_to_path(self, key: tuple) -> str:
+        return f"{self.path}/{ClockCache.make_key(key, self.source_hash)}.npz"
+
+    def get(self, key: tuple):
+        """Return cached adjacency or ``None`` if key isn't cached yet."""
+        from mutwo import project_converters
+
+        path = self._key_to_path(key)
+        try:
+            with np.load(path) as npz_file:
+                gatra_array = npz_file["gatra_array"]
+                index_pointer_array = npz_file["index_pointer_array"]
+                index_array = npz_file["index_array"]
+        except FileNotFoundError:
+            return None
+        except (EOFError, KeyError, ValueError, zipfile.BadZipFile):
+            os.remove(path)
+            return None
+        return project_converters.GatraAdjacency(
+            tuple(tuple(map(tuple, gatra)) for gatra in gatra_array.tolist()),
+            index_pointer_array,
+            index_array,
+        )
+
+    def set(self, key: tuple, adjacency):
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f,
+                gatra_array=np.array(adjacency.gatra_tuple, dtype=np.int64),
+                index_pointer_array=adjacency.index_pointer_array,
+                index_array=adjacency.index_array,
+            )
+        os.replace(tmp_path, self._key_to_path(key))
+
+    def clear(self):
+        for path in glob.glob(f"{self.path}/*.npz"):
+            os.remove(path)
@@ -0,0 +1,406 @@
+"""Precomputed chords of the pitch sets which are used in 10.2.
+
+:func:`mutwo.project_generators.find_chord_tuple` tests all combinations
+of the given pitches. But the same pitch sets are used again and again:
+there are only 16 pentatonic scales and the instruments always have the
+same pitches. So for each pitch set a :class:`ChordDatabase` stores all
+chords (up to :const:`MAX_PITCH_COUNT` pitches) with their harmonicity,
+their smallest and biggest interval and (if the chords are searched for
+an instrument) if they can be played on the instrument in a SQLite
+file. Then :func:`find_chord_tuple` only needs to query the chords which
+fulfill the constraints instead of testing all combinations. The chord
+searches of the entries use :func:`find_chord_tuple`.
+
+The databases are created when they are used first (or by :func:`build`)
+and are saved in 'builds/cache/chord-databases'.
+"""
+
+import inspect
+import itertools
+import os
+import sqlite3
+import tempfile
+import threading
+import typing
+
+import numpy as np
+
+from mutwo import music_parameters
+from mutwo import project_generators
+
+import project
+
+CHORD_DATABASE_PATH = "builds/cache/chord-databases"
+
+# Chords with more pitches are searched by testing all combinations.
+MAX_PITCH_COUNT = 4
+
+# Each chord is saved as bit mask in a SQLite integer.
+MAX_PITCH_SET_SIZE = 63
+
+# Harmonicity, intervals and chords are computed in 'project_generators'.
+CHORD_SOURCE_PATH_TUPLE = ("mutwo/project_generators/chords.py", "project/chords.py")
+
+# Same as in 'project_generators.find_chord_tuple'.
+_TOLERANCE = 1e-9
+
+_SCHEMA = """
+CREATE TABLE chord (
+    pitch_count INTEGER NOT NULL,
+    pitch_mask INTEGER NOT NULL,
+    harmonicity REAL,
+    min_cents REAL,
+    max_cents REAL,
+    fingerable INTEGER
+);
+CREATE INDEX chord_harmonicity ON chord (pitch_count, harmonicity);
+CREATE INDEX chord_min_cents ON chord (pitch_count, min_cents);
+CREATE INDEX chord_max_cents ON chord (pitch_count, max_cents);
+CREATE INDEX chord_fingerable ON chord (pitch_count, fingerable);
+"""
+
+
+class ChordDatabase(object):
+    """Index of all chords of a pitch set.
+
+    :param pitch_tuple: The pitch set.
+    :type pitch_tuple: tuple[music_parameters.JustIntonationPitch, ...]
+    :param path: Directory where the database is saved.
+    :type path: str
+    :param max_pitch_count: Chords with up to this many pitches are saved.
+    :type max_pitch_count: int
+    :param instrument: If the instrument has fingerings (see
+        ``pitch_sequence_to_fingering_tuple``), only chords which can be
+        fingered on the instrument are queried.
+    :type instrument: typing.Optional[music_parameters.abc.Instrument]
+
+    A :class:`ChordDatabase` is a ``backend`` of
+    :func:`mutwo.project_generators.find_chord_tuple`: it only yields
+    those pitch combinations which fulfill the constraints.
+    If the pitch set of a query isn't covered by the database (e.g.
+    if ``picked_pitch_tuple`` contains other pitches), the query is
+    checked by ``find_chord_tuple`` itself.
+    """
+
+    def __init__(
+        self,
+        pitch_tuple: tuple[music_parameters.JustIntonationPitch, ...],
+        path: str = CHORD_DATABASE_PATH,
+        max_pitch_count: int = MAX_PITCH_COUNT,
+        instrument: typing.Optional[music_parameters.abc.Instrument] = None,
+    ):
+        self.pitch_tuple = tuple(
+            sorted({p.ratio: p for p in pitch_tuple}.values(), key=lambda p: p.ratio)
+        )
+        if len(self.pitch_tuple) > MAX_PITCH_SET_SIZE:
+            raise ValueError(
+                f"Chord database can't save more than {MAX_PITCH_SET_SIZE} pitches"
+            )
+        self.max_pitch_count = max_pitch_count
+        if hasattr(instrument, "pitch_sequence_to_fingering_tuple"):
+            self.instrument = instrument
+        else:
+            self.instrument = None
+        self._ratio_to_index = {
+            p.ratio: index for index, p in enumerate(self.pitch_tuple)
+        }
+        key = project.cache.ClockCache.make_key(
+            tuple(p.ratio for p in self.pitch_tuple),
+            max_pitch_count,
+            _get_instrument_key(self.instrument),
+            project.cache.hash_path_tuple(CHORD_SOURCE_PATH_TUPLE),
+        )
+        self.path = f"{path}/{key}.sqlite"
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        if not os.path.exists(self.path):
+            self.build()
+
+    def __call__(
+        self,
+        picked_pitch_tuple,
+        valid_pitch_tuple,
+        difference,
+        min_harmonicity,
+        max_harmonicity,
+        min_interval,
+        max_interval,
+    ) -> typing.Iterator[tuple[music_parameters.JustIntonationPitch, ...]]:
+        pitch_count = len(picked_pitch_tuple) + difference
+        try:
+            picked_mask = self._get_mask(picked_pitch_tuple)
+            valid_mask = self._get_mask(valid_pitch_tuple)
+        except KeyError:
+            picked_mask = None
+        # Queries which aren't covered by the database are checked by
+        # 'find_chord_tuple'. Without any pair there is nothing to filter
+        # (and nothing to compute the average of).
+        if (
+            picked_mask is None
+            or pitch_count > self.max_pitch_count
+            or len(picked_pitch_tuple) * difference + difference * (difference - 1) // 2
+            == 0
+        ):
+            return itertools.combinations(valid_pitch_tuple, difference)
+
+        condition_list = [
+            "pitch_count = ?",
+            "(pitch_mask & ?) = ?",
+            "(pitch_mask & ?) = 0",
+        ]
+        argument_list = [
+            pitch_count,
+            picked_mask,
+            picked_mask,
+            ((1 << len(self.pitch_tuple)) - 1) & ~(picked_mask | valid_mask),
+        ]
+        if self.instrument is not None:
+            condition_list.append("fingerable = 1")
+        # The saved chords contain all pairs, but the pairs between
+        # the picked pitches aren't part of the query.
+        if len(picked_pitch_tuple) < 2:
+            if min_interval:
+                condition_list.append("min_cents >= ?")
+                argument_list.append(min_interval.interval - _TOLERANCE)
+            if max_interval:
+                condition_list.append("max_cents <= ?")
+                argument_list.append(max_interval.interval + _TOLERANCE)
+            # 'nan' is saved as NULL: it can't be compared, so let
+            # 'find_chord_tuple' decide.
+            if min_harmonicity:
+                condition_list.append("(harmonicity IS NULL OR harmonicity >= ?)")
+                argument_list.append(min_harmonicity - _TOLERANCE)
+            if max_harmonicity:
+                condition_list.append("(harmonicity IS NULL OR harmonicity <= ?)")
+                argument_list.append(max_harmonicity + _TOLERANCE)
+
+        with self._lock:
+            pitch_mask_list = [
+                pitch_mask
+                for pitch_mask, in self._get_connection().execute(
+                    f"SELECT pitch_mask FROM chord WHERE {' AND '.join(condition_list)}",
+                    argument_list,
+                )
+            ]
+
+        # Same order as 'itertools.combinations(valid_pitch_tuple, ...)'
+        partner_index_tuple_list = sorted(
+            tuple(
+                index
+                for index in range(len(self.pitch_tuple))
+                if (pitch_mask & ~picked_mask) >> index & 1
+            )
+            for pitch_mask in pitch_mask_list
+        )
+        return (
+            tuple(self.pitch_tuple[index] for index in partner_index_tuple)
+            for partner_index_tuple in partner_index_tuple_list
+        )
+
+    def build(self):
+        """Compute and save all chords of the pitch set."""
+        pitch_count = len(self.pitch_tuple)
+        harmonicity_matrix = np.full((pitch_count, pitch_count), np.nan)
+        cents_matrix = np.zeros((pitch_count, pitch_count))
+        for index0, index1 in itertools.combinations(range(pitch_count), 2):
+            interval = self.pitch_tuple[index0] - self.pitch_tuple[index1]
+            harmonicity_matrix[index0, index1] = interval.harmonicity_simplified_barlow
+            cents_matrix[index0, index1] = abs(interval.interval)
+
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        # Build in a temporary file, so that other processes never
+        # see an incomplete database.
+        fd, temporary_path = tempfile.mkstemp(dir=directory, suffix=".sqlite")
+        os.close(fd)
+        try:
+            connection = sqlite3.connect(temporary_path)
+            try:
+                connection.executescript(_SCHEMA)
+                for chord_pitch_count in range(1, self.max_pitch_count + 1):
+                    connection.executemany(
+                        "INSERT INTO chord VALUES (?, ?, ?, ?, ?, ?)",
+                        self._make_row_iterator(
+                            chord_pitch_count, harmonicity_matrix, cents_matrix
+                        ),
+                    )
+                connection.commit()
+            finally:
+                connection.close()
+            os.replace(temporary_path, self.path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+    def _make_row_iterator(self, chord_pitch_count, harmonicity_matrix, cents_matrix):
+        if chord_pitch_count > len(self.pitch_tuple):
+            return
+        index_array = np.array(
+            tuple(
+                itertools.combinations(range(len(self.pitch_tuple)), chord_pitch_count)
+            ),
+            dtype=np.intp,
+        ).reshape(-1, chord_pitch_count)
+        pitch_mask_array = (np.int64(1) << index_array.astype(np.int64)).sum(axis=1)
+        fingerable_list = self._get_fingerable_list(index_array)
+        if chord_pitch_count < 2:
+            for pitch_mask, fingerable in zip(
+                pitch_mask_array.tolist(), fingerable_list
+            ):
+                yield chord_pitch_count, pitch_mask, None, None, None, fingerable
+            return
+        column_pair_array = np.array(
+            tuple(itertools.combinations(range(chord_pitch_count), 2)), dtype=np.intp
+        )
+        row_array0 = index_array[:, column_pair_array[:, 0]]
+        row_array1 = index_array[:, column_pair_array[:, 1]]
+        harmonicity_array = harmonicity_matrix[row_array0, row_array1].mean(axis=1)
+        cents_array = cents_matrix[row_array0, row_array1]
+        for pitch_mask, harmonicity, min_cents, max_cents, fingerable in zip(
+            pitch_mask_array.tolist(),
+            harmonicity_array.tolist(),
+            cents_array.min(axis=1).tolist(),
+            cents_array.max(axis=1).tolist(),
+            fingerable_list,
+        ):
+            yield (
+                chord_pitch_count,
+                pitch_mask,
+                None if harmonicity != harmonicity else harmonicity,
+                min_cents,
+                max_cents,
+                fingerable,
+            )
+
+    def _get_fingerable_list(self, index_array) -> list[typing.Optional[int]]:
+        if self.instrument is None:
+            return [None] * len(index_array)
+        # Same test as in 'project_generators.find_chord_tuple' (the
+        # indices are sorted, so the pitches are sorted, too).
+        return [
+            int(
+                bool(
+                    self.instrument.pitch_sequence_to_fingering_tuple(
+                        tuple(self.pitch_tuple[index] for index in index_tuple)
+                    )
+                )
+            )
+            for index_tuple in index_array.tolist()
+        ]
+
+    def _get_mask(self, pitch_tuple) -> int:
+        mask = 0
+        for p in pitch_tuple:
+            mask |= 1 << self._ratio_to_index[p.ratio]
+        return mask
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # Connections can't be shared with forked processes.
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(
+                f"file:{self.path}?mode=ro", uri=True, check_same_thread=False
+            )
+            self._pid = os.getpid()
+        return self._connection
+
+
+def _get_instrument_key(instrument) -> typing.Optional[tuple[str, ...]]:
+    if instrument is None:
+        return None
+    # The fingerings are defined in the code of the instrument class.
+    try:
+        source_hash = project.cache.hash_path_tuple(
+            (inspect.getsourcefile(type(instrument)),)
+        )
+    except (TypeError, OSError):
+        source_hash = ""
+    return (
+        type(instrument).__qualname__,
+        getattr(instrument, "name", ""),
+        source_hash,
+    )
+
+
+_key_to_chord_database = {}
+
+
+def get_chord_database(
+    pitch_tuple: tuple[music_parameters.JustIntonationPitch, ...],
+    instrument: typing.Optional[music_parameters.abc.Instrument] = None,
+) -> typing.Optional[ChordDatabase]:
+    """Get (and if necessary build) the chord database of a pitch set.
+
+    Returns ``None`` if the pitch set is too big for a database.
+    """
+    if not hasattr(instrument, "pitch_sequence_to_fingering_tuple"):
+        instrument = None
+    key = (
+        tuple(sorted({p.ratio for p in pitch_tuple})),
+        _get_instrument_key(instrument),
+    )
+    try:
+        return _key_to_chord_database[key]
+    except KeyError:
+        pass
+    try:
+        chord_database = ChordDatabase(pitch_tuple, instrument=instrument)
+    except ValueError:
+        chord_database = None
+    _key_to_chord_database[key] = chord_database
+    return chord_database
+
+
+_FIND_CHORD_TUPLE_SIGNATURE = inspect.signature(project_generators.find_chord_tuple)
+
+
+def find_chord_tuple(
+    picked_pitch_tuple: tuple[music_parameters.JustIntonationPitch, ...] = tuple([]),
+    pitch_tuple: tuple[music_parameters.JustIntonationPitch, ...] = tuple([]),
+    *args,
+    **kwargs,
+) -> tuple[project_generators.Chord, ...]:
+    """Same as :func:`mutwo.project_generators.find_chord_tuple`.
+
+    But chords are queried from the :class:`ChordDatabase` of
+    ``pitch_tuple`` (and ``instrument``).
+    """
+    argument_dict = _FIND_CHORD_TUPLE_SIGNATURE.bind_partial(
+        picked_pitch_tuple, pitch_tuple, *args, **kwargs
+    ).arguments
+    if "backend" not in argument_dict and (
+        chord_database := get_chord_database(
+            pitch_tuple, argument_dict.get("instrument", None)
+        )
+    ):
+        kwargs["backend"] = chord_database
+    return project_generators.find_chord_tuple(
+        picked_pitch_tuple, pitch_tuple, *args, **kwargs
+    )
+
+
+def get_pitch_tuple_tuple() -> (
+    tuple[tuple[music_parameters.JustIntonationPitch, ...], ...]
+):
+    """Pitch sets of the chord searches of the entries."""
+    pitch_tuple_list = [
+        # See 'project/entries/dynamic/modal/alternating-scale-chords.py'
+        tuple(
+            scale.scale_position_to_pitch((d, 0)).normalize(mutate=False)
+            for d in range(scale.scale_degree_count)
+        )
+        for scale in project.constants.PENTATONIC_SCALE_TUPLE
+    ]
+    # See 'project/entries/dynamic/modal/pattern.py'
+    for instrument in (
+        project.constants.ORCHESTRATION.GLOCKENSPIEL,
+        project.constants.ORCHESTRATION.HARP,
+    ):
+        pitch_tuple_list.append(instrument.pitch_tuple)
+    return tuple(pitch_tuple_list)
+
+
+def build():
+    """Build the chord databases of all pitch sets of the entries."""
+    for pitch_tuple in get_pitch_tuple_tuple():
+        get_chord_database(pitch_tuple)
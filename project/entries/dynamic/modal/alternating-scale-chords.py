@@ -30,7 +30,6 @@ import ranges
 
 from mutwo import diary_interfaces
 from mutwo import music_parameters
-from mutwo import project_generators
 from mutwo import project_parameters
 
 import project
@@ -76,17 +75,15 @@ def get_tunable_chord_tuple(context, pitch_tuple):
     available_pitch_tuple = scale_to_available_pitch_tuple(context.modal_event.scale)
     tunable_chord_list = []
     for p in pitch_tuple:
-        champion, fitness = None, None
-        for c in project_generators.find_chord_tuple(
+        champion_tuple = project.chords.find_chord_tuple(
             (p.normalize(),),
             available_pitch_tuple,
             pitch_count_range=ranges.Range(3, 4),
             min_harmonicity=None,
-        ):
-            if not champion or c.harmonicity > fitness:
-                champion, fitness = c, c.harmonicity
-        if champion is not None:
-            chord = champion.pitch_tuple
+            top_k=1,
+        )
+        if champion_tuple:
+            chord = champion_tuple[0].pitch_tuple
         else:
             chord = tuple([])
         tunable_chord_list.append(chord)
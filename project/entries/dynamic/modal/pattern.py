@@ -7,10 +7,11 @@ from mutwo import core_events
 from mutwo import music_events
 from mutwo import music_parameters
 from mutwo import project_events
-from mutwo import project_generators
 from mutwo import project_utilities
 from mutwo import timeline_interfaces
 
+import project
+
 
 def is_supported(context, pitch=None, **kwargs):
     # XXX: DEACTIVATED
@@ -63,7 +64,7 @@ def main(
 
     event_count = duration_to_event_count(real_duration)
 
-    chord_tuple = project_generators.find_chord_tuple(
+    chord_tuple = project.chords.find_chord_tuple(
         (main_pitch_tuple[0],),
         # No pitches..
         # tuple(p for p in instrument.pitch_tuple if p in scale.pitch_tuple),
@@ -72,13 +73,10 @@ def main(
         # Disallow octaves by only allowing intervals smaller than
         # big seventh
         max_interval=music_parameters.JustIntonationPitch("15/8"),
+        top_k=1,
     )
-    champion, fitness = None, None
-    for c in chord_tuple:
-        if not champion or c.harmonicity > fitness:
-            champion, fitness = c, c.harmonicity
-    if champion is not None:
-        chord = champion.pitch_tuple
+    if chord_tuple:
+        chord = chord_tuple[0].pitch_tuple
     else:
         chord = (main_pitch_tuple[0],)
 
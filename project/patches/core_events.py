@@ -37,3 +37,56 @@ def SimultaneousEvent_repeat(
 
 core_events.SequentialEvent.repeat = SequentialEvent_repeat
 core_events.SimultaneousEvent.repeat = SimultaneousEvent_repeat
+
+
+# Envelopes (e.g. the envelope of each pitch or the tempo envelope of
+# each event) keep their (default) functions as attributes. Some of
+# those are lambdas or local functions, which can't be pickled: so
+# clocks couldn't be cached or sent to other processes. Therefore
+# default functions aren't pickled, but taken from a new envelope
+# of the same class when the envelope is unpickled.
+
+
+class _DefaultFunction(object):
+    pass
+
+
+def _get_default_envelope(cls) -> typing.Optional[core_events.Envelope]:
+    try:
+        return _cls_to_default_envelope[cls]
+    except KeyError:
+        pass
+    try:
+        default_envelope = cls([])
+    except Exception:
+        default_envelope = None
+    _cls_to_default_envelope[cls] = default_envelope
+    return default_envelope
+
+
+_cls_to_default_envelope = {}
+
+
+def Envelope__getstate__(self) -> dict:
+    state = dict(self.__dict__)
+    if (default_envelope := _get_default_envelope(type(self))) is None:
+        return state
+    for name, value in state.items():
+        if (
+            (code := getattr(value, "__code__", None)) is not None
+            and "<" in value.__qualname__
+            and getattr(getattr(default_envelope, name, None), "__code__", None) is code
+        ):
+            state[name] = _DefaultFunction()
+    return state
+
+
+def Envelope__setstate__(self, state: dict):
+    for name, value in state.items():
+        if isinstance(value, _DefaultFunction):
+            state[name] = getattr(_get_default_envelope(type(self)), name)
+    self.__dict__.update(state)
+
+
+core_events.Envelope.__getstate__ = Envelope__getstate__
+core_events.Envelope.__setstate__ = Envelope__setstate__
@@ -1,5 +1,13 @@
+import heapq
+import itertools
+import struct
+
 import mido
+import numpy as np
+from mido.midifiles.midifiles import encode_variable_int
 
+from mutwo import core_events
+from mutwo import core_parameters
 from mutwo import midi_converters
 
 # This fixes bad parameters:
@@ -9,16 +17,11 @@ from mutwo import midi_converters
 # breaks. it would be better to raise a warning and continue.
 if 1:
 
-    def EventToMidiFile__simple_event_to_midi_message_tuple(
-        self,
-        simple_event,
-        absolute_time,
-        available_midi_channel_tuple_cycle,
-    ):
+    def _simple_event_to_extracted_data_list(self, simple_event):
+        """Extract pitch list, volume and control messages (``None`` for rests)."""
         extracted_data_list = []
 
         # try to extract the relevant data
-        is_rest = False
         for extraction_function in (
             self._simple_event_to_pitch_list,
             self._simple_event_to_volume,
@@ -27,18 +30,24 @@ if 1:
             try:
                 extracted_data = extraction_function(simple_event)
             except AttributeError:
-                is_rest = True
-            else:
-                if extracted_data is None:
-                    # TODO(Raise warning)!
-                    is_rest = True
-            if is_rest:
-                break
+                return None
+            if extracted_data is None:
+                # TODO(Raise warning)!
+                return None
             extracted_data_list.append(extracted_data)
+        return extracted_data_list
+
+    def EventToMidiFile__simple_event_to_midi_message_tuple(
+        self,
+        simple_event,
+        absolute_time,
+        available_midi_channel_tuple_cycle,
+    ):
+        extracted_data_list = _simple_event_to_extracted_data_list(self, simple_event)
 
         # if not all relevant data could be extracted, simply ignore the
         # event
-        if is_rest:
+        if extracted_data_list is None:
             return tuple([])
 
         # otherwise generate midi messages from the extracted data
@@ -145,3 +154,340 @@ if 1:
     midi_converters.EventToMidiFile._midi_message_tuple_to_midi_track = (
         _midi_message_tuple_to_midi_track
     )
+
+# Write midi files while the messages are made (if 'convert' gets a
+# path). Instead of collecting all messages of a track and sorting them,
+# each sequential event yields its messages in time order and the
+# message streams are merged with a heap. Each track is written to
+# the file step by step, so memory doesn't grow with the duration of
+# the event.
+#
+# The start and end ticks of all simple events of a track are computed
+# at once with NumPy (instead of adding up fractions and converting
+# each time to ticks). Floats are precise enough: a tick only differs
+# from the tick of the exact time, if this time is less than
+# '_TICK_TOLERANCE' ticks away from the next tick.
+_TICK_TOLERANCE = 1e-6
+
+if 1:
+
+    def _sequential_event_to_simple_event_list(
+        sequential_event, available_midi_channel_tuple, simple_event_list
+    ):
+        # Nested sequential events get their own midi channel cycle
+        # (like in '_sequential_event_to_midi_message_tuple').
+        available_midi_channel_tuple_cycle = itertools.cycle(
+            available_midi_channel_tuple
+        )
+        for event in sequential_event:
+            if isinstance(event, core_events.SimpleEvent):
+                simple_event_list.append((event, available_midi_channel_tuple_cycle))
+            else:
+                _sequential_event_to_simple_event_list(
+                    event, available_midi_channel_tuple, simple_event_list
+                )
+        return simple_event_list
+
+    def _duration_to_tick_array(ticks_per_beat, duration_array):
+        return np.floor(duration_array * ticks_per_beat + _TICK_TOLERANCE).astype(
+            np.int64
+        )
+
+    def _sequential_event_to_simple_event_midi_message_iterator(
+        self, sequential_event, available_midi_channel_tuple, ticks_per_beat
+    ):
+        """Yield start tick and unsorted midi messages of each simple event.
+
+        All start and end ticks are computed at once (with floats
+        instead of fractions, see '_TICK_TOLERANCE'). 'ticks_per_beat'
+        are the ticks per beat of the event (which differ from the ticks
+        per beat of the midi file if the event has another tempo).
+        """
+        simple_event_list = _sequential_event_to_simple_event_list(
+            sequential_event, available_midi_channel_tuple, []
+        )
+        duration_array = np.array(
+            [
+                float(simple_event.duration.duration)
+                for simple_event, _ in simple_event_list
+            ],
+            dtype=np.float64,
+        )
+        absolute_time_array = np.concatenate(([0.0], np.cumsum(duration_array)[:-1]))
+        tick_start_list = _duration_to_tick_array(
+            ticks_per_beat, absolute_time_array
+        ).tolist()
+        tick_end_list = (
+            np.array(tick_start_list, dtype=np.int64)
+            + _duration_to_tick_array(ticks_per_beat, duration_array)
+        ).tolist()
+        static_pitch_dict = {}
+        for (
+            (simple_event, available_midi_channel_tuple_cycle),
+            tick_start,
+            tick_end,
+        ) in zip(simple_event_list, tick_start_list, tick_end_list):
+            yield tick_start, _simple_event_to_midi_message_tuple_from_ticks(
+                self,
+                simple_event,
+                tick_start,
+                tick_end,
+                available_midi_channel_tuple_cycle,
+                static_pitch_dict,
+            )
+
+    def _simple_event_to_midi_message_tuple_from_ticks(
+        self,
+        simple_event,
+        tick_start,
+        tick_end,
+        available_midi_channel_tuple_cycle,
+        static_pitch_dict,
+    ):
+        """Same as '_extracted_data_to_midi_message_tuple', but with ticks."""
+        extracted_data_list = _simple_event_to_extracted_data_list(self, simple_event)
+        if extracted_data_list is None:
+            return tuple([])
+        pitch_list, volume, control_message_tuple = extracted_data_list
+        velocity = volume.midi_velocity
+
+        midi_message_list = []
+        for control_message in control_message_tuple:
+            control_message.time = tick_start
+            midi_message_list.append(control_message)
+        for pitch in pitch_list:
+            midi_message_list.extend(
+                _note_information_to_midi_message_tuple_from_ticks(
+                    self,
+                    tick_start,
+                    tick_end,
+                    velocity,
+                    pitch,
+                    next(available_midi_channel_tuple_cycle),
+                    static_pitch_dict,
+                )
+            )
+        return tuple(midi_message_list)
+
+    def _note_information_to_midi_message_tuple_from_ticks(
+        self, tick_start, tick_end, velocity, pitch, midi_channel, static_pitch_dict
+    ):
+        """Same as '_note_information_to_midi_message_tuple', but faster.
+
+        Pitches without glissando always get the same midi pitch and
+        pitch bending number, so '_tune_pitch' only needs to run once
+        for them.
+        """
+        pitch_envelope = pitch.envelope
+        if not pitch_envelope.is_static:
+            return self._note_information_to_midi_message_tuple(
+                tick_start, tick_end, velocity, pitch, midi_channel
+            )
+        key = (pitch.frequency, pitch_envelope.value_tuple[0])
+        try:
+            midi_pitch, pitch_bending_number = static_pitch_dict[key]
+        except KeyError:
+            midi_pitch, (pitch_bending_message,) = self._tune_pitch(
+                0, 2, pitch, midi_channel
+            )
+            pitch_bending_number = pitch_bending_message.pitch
+            static_pitch_dict[key] = midi_pitch, pitch_bending_number
+        return (
+            mido.Message(
+                "pitchwheel",
+                channel=midi_channel,
+                pitch=pitch_bending_number,
+                time=tick_start - 1 if tick_start != 0 else tick_start,
+            ),
+            mido.Message(
+                "note_on",
+                note=midi_pitch,
+                velocity=velocity,
+                time=tick_start,
+                channel=midi_channel,
+            ),
+            mido.Message(
+                "note_off",
+                note=midi_pitch,
+                velocity=velocity,
+                time=tick_end,
+                channel=midi_channel,
+            ),
+        )
+
+    def _sequential_event_to_midi_message_iterator(
+        self, sequential_event, available_midi_channel_tuple, ticks_per_beat
+    ):
+        """Yield midi messages (with absolute time) sorted by time.
+
+        Messages with the same time keep their order (like 'sorted').
+        """
+        # The messages of a simple event never start earlier than one
+        # tick before the simple event (pitch bending starts one tick
+        # earlier). So once we reach a simple event, all buffered
+        # messages which are earlier than this simple event are final.
+        message_heap, counter = [], itertools.count()
+        for (
+            absolute_tick_start,
+            midi_message_tuple,
+        ) in _sequential_event_to_simple_event_midi_message_iterator(
+            self, sequential_event, available_midi_channel_tuple, ticks_per_beat
+        ):
+            while message_heap and message_heap[0][0] < absolute_tick_start:
+                yield heapq.heappop(message_heap)[2]
+            for midi_message in midi_message_tuple:
+                heapq.heappush(
+                    message_heap, (midi_message.time, next(counter), midi_message)
+                )
+        while message_heap:
+            yield heapq.heappop(message_heap)[2]
+
+    def _write_midi_track(
+        self, midi_file, midi_message_iterator, duration_in_ticks, is_first_track
+    ):
+        meta_message_list = [
+            mido.MetaMessage("instrument_name", name=self._instrument_name)
+        ]
+        if is_first_track:
+            meta_message_list.append(
+                mido.MetaMessage("time_signature", numerator=4, denominator=4)
+            )
+            midi_message_iterator = heapq.merge(
+                midi_message_iterator,
+                self._tempo_envelope_to_midi_message_tuple(self._tempo_envelope),
+                key=lambda message: message.time,
+            )
+
+        midi_file.write(b"MTrk")
+        size_position = midi_file.tell()
+        midi_file.write(b"\0\0\0\0")
+
+        data, size = bytearray(), 0
+        for meta_message in meta_message_list:
+            data.append(0)
+            data.extend(meta_message.bytes())
+
+        running_status_byte, absolute_tick = None, None
+        for midi_message in midi_message_iterator:
+            delta_tick = midi_message.time - (absolute_tick or 0)
+            if delta_tick < 0:
+                raise ValueError(f"Midi message '{midi_message}' isn't sorted")
+            absolute_tick = midi_message.time
+            data.extend(encode_variable_int(delta_tick))
+            if midi_message.is_meta:
+                data.extend(midi_message.bytes())
+                running_status_byte = None
+            elif midi_message.type == "sysex":
+                data.append(0xF0)
+                data.extend(encode_variable_int(len(midi_message.data) + 1))
+                data.extend(midi_message.data)
+                data.append(0xF7)
+                running_status_byte = None
+            else:
+                midi_message_bytes = midi_message.bytes()
+                status_byte = midi_message_bytes[0]
+                if status_byte == running_status_byte:
+                    data.extend(midi_message_bytes[1:])
+                else:
+                    data.extend(midi_message_bytes)
+                running_status_byte = status_byte if status_byte < 0xF0 else None
+            if len(data) >= 2**16:
+                midi_file.write(data)
+                size += len(data)
+                data.clear()
+
+        # Like in '_midi_message_tuple_to_midi_track': a track without
+        # messages ends immediately, otherwise the track lasts at least
+        # as long as the event.
+        if absolute_tick is None:
+            data.extend(encode_variable_int(0))
+        else:
+            data.extend(encode_variable_int(max(duration_in_ticks - absolute_tick, 0)))
+        data.extend(mido.MetaMessage("end_of_track").bytes())
+        midi_file.write(data)
+        size += len(data)
+
+        end_position = midi_file.tell()
+        midi_file.seek(size_position)
+        midi_file.write(struct.pack(">L", size))
+        midi_file.seek(end_position)
+
+    def _write_midi_file(self, event_to_convert, path, tempo):
+        # A static tempo is the same as scaling all durations (like
+        # 'metrize' does), so it's simply applied on the ticks per beat
+        # (as float, a fraction would make the tick arrays object arrays).
+        ticks_per_beat = float(self._ticks_per_beat * 60 / tempo)
+        if isinstance(event_to_convert, core_events.SimpleEvent):
+            event_to_convert = core_events.SequentialEvent([event_to_convert])
+        if isinstance(event_to_convert, core_events.SequentialEvent):
+            event_to_convert = core_events.SimultaneousEvent([event_to_convert])
+
+        midi_message_iterator_list = [
+            _sequential_event_to_midi_message_iterator(
+                self, sequential_event, available_midi_channel_tuple, ticks_per_beat
+            )
+            for sequential_event, available_midi_channel_tuple in zip(
+                event_to_convert,
+                self._find_available_midi_channel_tuple_per_sequential_event(
+                    event_to_convert
+                ),
+            )
+        ]
+        if self._midi_file_type == 0:
+            midi_message_iterator_list = [
+                heapq.merge(
+                    *midi_message_iterator_list, key=lambda message: message.time
+                )
+            ]
+        duration_in_ticks = int(
+            _duration_to_tick_array(
+                ticks_per_beat,
+                np.array([float(event_to_convert.duration.duration)], dtype=np.float64),
+            )[0]
+        )
+
+        with open(path, "wb") as midi_file:
+            header = struct.pack(
+                ">hhh",
+                self._midi_file_type,
+                len(midi_message_iterator_list),
+                self._ticks_per_beat,
+            )
+            midi_file.write(b"MThd")
+            midi_file.write(struct.pack(">L", len(header)))
+            midi_file.write(header)
+            for index, midi_message_iterator in enumerate(midi_message_iterator_list):
+                _write_midi_track(
+                    self,
+                    midi_file,
+                    midi_message_iterator,
+                    duration_in_ticks,
+                    is_first_track=index == 0,
+                )
+
+    def EventToMidiFile_convert(self, event_to_convert, path=None, tempo=60):
+        """Write midi file to 'path' or return a 'mido.MidiFile'.
+
+        If 'path' is set, the midi file is written while the messages
+        are made and ``None`` is returned.
+
+        'tempo' is the static tempo (in BPM) of 'event_to_convert': it's
+        applied on the durations of the event, so the event doesn't
+        need to be metrized before.
+        """
+        if path is None:
+            if tempo != 60:
+                event_to_convert = event_to_convert.set(
+                    "tempo_envelope",
+                    core_events.TempoEnvelope(
+                        [
+                            [absolute_time, core_parameters.DirectTempoPoint(tempo)]
+                            for absolute_time in (0, event_to_convert.duration)
+                        ]
+                    ),
+                    mutate=False,
+                ).metrize()
+            return self._event_to_midi_file(event_to_convert)
+        _write_midi_file(self, event_to_convert, path, tempo)
+
+    midi_converters.EventToMidiFile.convert = EventToMidiFile_convert
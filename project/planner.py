@@ -0,0 +1,420 @@
+"""Plan incremental builds with the dependency graph of the diary entries.
+
+The entries of 10.2 are registered with ``DynamicEntry.from_file`` (or
+``ClockEntry.from_file``) in 'project/entries/dynamic/*/__init__.py'.
+Those registrations already list the dependencies of each entry via
+``abbreviation_to_path_dict`` (e.g. 'scale-harp' depends on 'scale' and
+'dyad'). This module reads the registrations (without importing them),
+builds a dependency graph and finds out which entry files changed since
+the last build.
+
+During a build we record for each page which entries were evaluated
+or supported by one of the contexts of the page. A page only needs to
+be generated again if
+
+    (1) one of its recorded entries (or any of their dependencies) changed
+    (2) the selection code of any entry changed: this is the code of
+        its 'is_supported' function and everything it refers to. Such a
+        change can make an entry available for contexts of other pages.
+
+Changes to the 'main' function of an entry only affect those pages which
+already used the entry.
+"""
+
+from __future__ import annotations
+
+import ast
+import collections
+import contextlib
+import dataclasses
+import functools
+import hashlib
+import json
+import os
+import typing
+
+import project
+
+ENTRY_REGISTRATION_PATH_TUPLE = (
+    "project/entries/dynamic/modal/__init__.py",
+    "project/entries/dynamic/clocks/__init__.py",
+)
+
+MANIFEST_PATH = "builds/cache/manifest.json"
+
+
+@dataclasses.dataclass(frozen=True)
+class Entry(object):
+    name: str
+    context: str
+    path: str
+    dependency_name_tuple: tuple[str, ...] = tuple([])
+
+
+def parse_entry_registration(path: str) -> tuple[Entry, ...]:
+    """Find all entries which are registered in the given python module."""
+    with open(path) as f:
+        tree = ast.parse(f.read(), filename=path)
+    directory = os.path.dirname(path)
+    variable_to_name = {}
+    entry_list = []
+    for statement in tree.body:
+        match statement:
+            case ast.Assign(targets=target_list, value=ast.Call() as call):
+                pass
+            case ast.Expr(value=ast.Call() as call):
+                target_list = []
+            case _:
+                continue
+        if not _is_entry_registration(call):
+            continue
+        entry = _registration_to_entry(call, directory, variable_to_name)
+        entry_list.append(entry)
+        for target in target_list:
+            if isinstance(target, ast.Name):
+                variable_to_name[target.id] = entry.name
+    return tuple(entry_list)
+
+
+def _is_entry_registration(call: ast.Call) -> bool:
+    match call.func:
+        case ast.Attribute(
+            value=ast.Attribute(attr="DynamicEntry" | "ClockEntry"), attr="from_file"
+        ):
+            return True
+    return False
+
+
+def _registration_to_entry(
+    call: ast.Call, directory: str, variable_to_name: dict[str, str]
+) -> Entry:
+    name = call.args[0].value
+    if call.func.value.attr == "ClockEntry":
+        context = "ClockContext"
+    else:
+        # diary_interfaces.ModalContext0.identifier => ModalContext0
+        context = call.args[1].value.attr
+
+    keyword_dict = {keyword.arg: keyword.value for keyword in call.keywords}
+
+    # f"{path}/scale.py" => scale.py
+    file_name = keyword_dict["file_path"].values[-1].value.strip("/")
+
+    dependency_name_list = []
+    if (d := keyword_dict.get("abbreviation_to_path_dict")) is not None:
+        # dict(scale=scale.path, dyad=dyad.path) => scale, dyad
+        for keyword in d.keywords:
+            dependency_name_list.append(variable_to_name[keyword.value.value.id])
+
+    return Entry(
+        name, context, os.path.join(directory, file_name), tuple(dependency_name_list)
+    )
+
+
+class EntryGraph(object):
+    """Dependency graph of diary entries."""
+
+    def __init__(self, entry_sequence: typing.Sequence[Entry]):
+        self._name_to_entry = {entry.name: entry for entry in entry_sequence}
+        self._name_to_dependent_name_set = collections.defaultdict(set)
+        self._path_to_name_set = collections.defaultdict(set)
+        for entry in entry_sequence:
+            self._path_to_name_set[entry.path].add(entry.name)
+            for dependency_name in entry.dependency_name_tuple:
+                self._name_to_dependent_name_set[dependency_name].add(entry.name)
+
+    @classmethod
+    def from_registration(
+        cls, path_sequence: typing.Sequence[str] = ENTRY_REGISTRATION_PATH_TUPLE
+    ) -> EntryGraph:
+        return cls(
+            [
+                entry
+                for path in path_sequence
+                for entry in parse_entry_registration(path)
+            ]
+        )
+
+    def __getitem__(self, name: str) -> Entry:
+        return self._name_to_entry[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._name_to_entry
+
+    @property
+    def path_tuple(self) -> tuple[str, ...]:
+        return tuple(sorted(self._path_to_name_set))
+
+    def get_entry_name_set(self, path: str) -> set[str]:
+        """Find names of all entries which are defined by the given file."""
+        return set(self._path_to_name_set.get(path, set([])))
+
+    def get_dependency_name_set(self, name: str) -> set[str]:
+        """Find all entries which the given entry uses (recursively)."""
+        return self._walk(name, lambda n: self[n].dependency_name_tuple)
+
+    def get_dependent_name_set(self, name: str) -> set[str]:
+        """Find all entries which use the given entry (recursively)."""
+        return self._walk(name, lambda n: self._name_to_dependent_name_set[n])
+
+    def _walk(self, name, get_neighbour_name_sequence) -> set[str]:
+        name_set, name_list = set([]), [name]
+        while name_list:
+            for neighbour_name in get_neighbour_name_sequence(name_list.pop()):
+                if neighbour_name not in name_set:
+                    name_set.add(neighbour_name)
+                    name_list.append(neighbour_name)
+        return name_set
+
+
+def get_source_fingerprint(path: str) -> tuple[str, str]:
+    """Return hash of the complete file and hash of its selection code.
+
+    The selection code is the 'is_supported' function and all module level
+    definitions it refers to (recursively). Because we compare the parsed
+    syntax trees, changes of comments or formatting don't count.
+    """
+    with open(path, "rb") as f:
+        source = f.read()
+    tree = ast.parse(source, filename=path)
+
+    name_to_node = {}
+    import_list = []
+    for statement in tree.body:
+        match statement:
+            case ast.Import() | ast.ImportFrom():
+                import_list.append(statement)
+            case ast.FunctionDef(name=name) | ast.ClassDef(name=name):
+                name_to_node[name] = statement
+            case ast.Assign(targets=target_list):
+                for target in target_list:
+                    if isinstance(target, ast.Name):
+                        name_to_node[target.id] = statement
+
+    selection_hash = ""
+    if "is_supported" in name_to_node:
+        line_to_node, name_list, visited_name_set = {}, ["is_supported"], set([])
+        while name_list:
+            if (name := name_list.pop()) in visited_name_set:
+                continue
+            visited_name_set.add(name)
+            node = line_to_node[name_to_node[name].lineno] = name_to_node[name]
+            for child in ast.walk(node):
+                if isinstance(child, ast.Name) and child.id in name_to_node:
+                    name_list.append(child.id)
+        selection_hash = hashlib.sha256(
+            "\n".join(
+                ast.dump(node)
+                for node in import_list
+                + [line_to_node[line] for line in sorted(line_to_node)]
+            ).encode()
+        ).hexdigest()
+
+    return hashlib.sha256(source).hexdigest(), selection_hash
+
+
+@contextlib.contextmanager
+def trace_entries():
+    """Record names of all entries which are called or supported.
+
+    **Example:**
+
+    >>> with trace_entries() as entry_name_set:
+    ...     clock = make_clock(0, 'river')
+    """
+    from mutwo import diary_interfaces
+
+    entry_name_set = set([])
+    patch_list = []
+    for cls in (
+        diary_interfaces.DynamicEntry,
+        getattr(diary_interfaces, "ClockEntry", None),
+    ):
+        for method_name in ("__call__", "is_supported"):
+            if (method := vars(cls or object).get(method_name)) is not None:
+                setattr(cls, method_name, _trace(method, method_name, entry_name_set))
+                patch_list.append((cls, method_name, method))
+    try:
+        yield entry_name_set
+    finally:
+        for cls, method_name, method in reversed(patch_list):
+            setattr(cls, method_name, method)
+
+
+def _trace(method, method_name, entry_name_set):
+    @functools.wraps(method)
+    def traced_method(self, *args, **kwargs):
+        r = method(self, *args, **kwargs)
+        # An entry which is only checked, but not supported by
+        # a context, couldn't have been selected.
+        if method_name == "__call__" or r:
+            entry_name_set.add(self.name)
+        return r
+
+    return traced_method
+
+
+class BuildPlanner(object):
+    """Find out which pages need to be generated again.
+
+    :param manifest_path: Where the state of the last build is saved.
+    :type manifest_path: str
+    :param entry_graph: The dependency graph of all entries. If ``None``
+        it is read from the entry registrations of 10.2.
+    :type entry_graph: typing.Optional[EntryGraph]
+    """
+
+    def __init__(
+        self,
+        manifest_path: str = MANIFEST_PATH,
+        entry_graph: typing.Optional[EntryGraph] = None,
+    ):
+        self.manifest_path = manifest_path
+        self.entry_graph = entry_graph or EntryGraph.from_registration()
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        self._last_path_to_fingerprint = {
+            path: tuple(fingerprint)
+            for path, fingerprint in manifest.get("fingerprint", {}).items()
+        }
+        self._page_to_state = {
+            int(page_index): state
+            for page_index, state in manifest.get("page", {}).items()
+        }
+        self._path_to_fingerprint = {
+            path: get_source_fingerprint(path) for path in self.entry_graph.path_tuple
+        }
+        # The registrations themselves (e.g. the relevance of an entry) and
+        # helper modules which aren't entries can affect any page.
+        entry_path_set = set(self.entry_graph.path_tuple)
+        self._generator_source_hash = project.cache.hash_generator_path_tuple(
+            project.cache.get_generator_source_path_tuple()
+            + tuple(
+                path
+                for path in project.cache.get_entry_source_path_tuple()
+                if os.path.normpath(path) not in entry_path_set
+            )
+        )
+        self._last_generator_source_hash = manifest.get("generator_source_hash", None)
+
+    @functools.cached_property
+    def changed_path_tuple(self) -> tuple[str, ...]:
+        """All entry files which changed since the last build."""
+        return tuple(
+            path
+            for path, fingerprint in self._path_to_fingerprint.items()
+            if self._last_path_to_fingerprint.get(path) != fingerprint
+        )
+
+    @functools.cached_property
+    def affected_entry_name_set(self) -> set[str]:
+        """All entries which changed or which depend on a changed entry."""
+        name_set = set([])
+        for path in self.changed_path_tuple:
+            for name in self.entry_graph.get_entry_name_set(path):
+                name_set.add(name)
+                name_set.update(self.entry_graph.get_dependent_name_set(name))
+        return name_set
+
+    @functools.cached_property
+    def is_selection_changed(self) -> bool:
+        if self._generator_source_hash != self._last_generator_source_hash:
+            return True
+        return any(
+            self._last_path_to_fingerprint.get(path, (None, None))[1]
+            != self._path_to_fingerprint[path][1]
+            for path in self.changed_path_tuple
+        )
+
+    def get_page_entry_name_tuple(
+        self, page_index: int
+    ) -> typing.Optional[tuple[str, ...]]:
+        """Entries which the page used in the last build (``None`` if unknown)."""
+        try:
+            return tuple(self._page_to_state[page_index]["entry_name_list"])
+        except KeyError:
+            return None
+
+    def get_page_clock_key(self, page_index: int) -> typing.Optional[str]:
+        return self._page_to_state.get(page_index, {}).get("clock_key", None)
+
+    def is_page_affected(self, page_index: int) -> bool:
+        if (entry_name_tuple := self.get_page_entry_name_tuple(page_index)) is None:
+            return True
+        return self.is_selection_changed or bool(
+            self._get_relevant_entry_name_set(entry_name_tuple).intersection(
+                self.affected_entry_name_set
+            )
+        )
+
+    def get_page_source_hash(self, page_index: int) -> str:
+        """Hash of all source code which could affect the given page.
+
+        This can be used as part of the cache key of a page.
+        """
+        h = hashlib.sha256(self._generator_source_hash.encode())
+        for path in self.entry_graph.path_tuple:
+            h.update(self._path_to_fingerprint[path][1].encode())
+
+        if (entry_name_tuple := self.get_page_entry_name_tuple(page_index)) is None:
+            path_set = set(self.entry_graph.path_tuple)
+        else:
+            path_set = set(
+                self.entry_graph[name].path
+                for name in self._get_relevant_entry_name_set(entry_name_tuple)
+            )
+        for path in sorted(path_set):
+            h.update(path.encode())
+            h.update(self._path_to_fingerprint[path][0].encode())
+        return h.hexdigest()
+
+    def set_page_state(
+        self, page_index: int, entry_name_tuple: typing.Sequence[str], clock_key: str
+    ):
+        self._page_to_state[page_index] = dict(
+            entry_name_list=sorted(entry_name_tuple), clock_key=clock_key
+        )
+
+    def report(self, page_index_sequence: typing.Sequence[int]):
+        """Print which entries changed and which pages need to be built."""
+        if self.changed_path_tuple:
+            print("changed entries:", ", ".join(sorted(self.affected_entry_name_set)))
+        print(
+            "pages to build:",
+            ", ".join(
+                str(page_index)
+                for page_index in page_index_sequence
+                if self.is_page_affected(page_index)
+            )
+            or "-",
+        )
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        with open(self.manifest_path, "w") as f:
+            json.dump(
+                dict(
+                    generator_source_hash=self._generator_source_hash,
+                    fingerprint=self._path_to_fingerprint,
+                    page={
+                        str(page_index): state
+                        for page_index, state in sorted(self._page_to_state.items())
+                    },
+                ),
+                f,
+                indent=1,
+            )
+
+    def _get_relevant_entry_name_set(
+        self, entry_name_tuple: typing.Sequence[str]
+    ) -> set[str]:
+        name_set = set([])
+        for name in entry_name_tuple:
+            # Entries could have been renamed or removed since the last build.
+            if name in self.entry_graph:
+                name_set.add(name)
+                name_set.update(self.entry_graph.get_dependency_name_set(name))
+        return name_set
@@ -0,0 +1,225 @@
+"""Measure where a build spends its time.
+
+If a :class:`Profiler` is active, each :func:`stage` records wall time,
+CPU time and peak RSS. The peak RSS is the peak of the process until
+the end of the stage (not of the stage itself): so all stages after
+the stage which used most memory report the same value. Additionally
+each evaluation of a diary entry and each subprocess (LilyPond,
+pdftk, ...) is recorded. The result can be written to a Chrome trace
+file (which can be opened with 'chrome://tracing' or
+https://ui.perfetto.dev) and printed as a summary table.
+
+If no profiler is active, :func:`stage` doesn't do anything, so it can
+stay in the code.
+"""
+
+from __future__ import annotations
+
+import collections
+import contextlib
+import functools
+import json
+import os
+import resource
+import subprocess
+import threading
+import time
+import typing
+
+PROFILE_PATH = "builds/profile.json"
+
+# The active profiler (or ``None``).
+PROFILER: typing.Optional[Profiler] = None
+
+
+class Profiler(object):
+    """Collect trace events of one process.
+
+    The trace events are dicts in the Chrome trace event format, so
+    that trace events of other processes (e.g. of the workers of
+    ``main.py --jobs``) can simply be added with
+    :meth:`add_trace_event_sequence`.
+    """
+
+    def __init__(self):
+        self.trace_event_list = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, category: str = "stage", **argument):
+        start = time.time_ns()
+        thread_time = time.thread_time()
+        children_time = _get_children_cpu_time()
+        try:
+            yield
+        finally:
+            cpu_time = time.thread_time() - thread_time
+            # Subprocesses (e.g. LilyPond) aren't part of the thread time.
+            cpu_time += _get_children_cpu_time() - children_time
+            trace_event = dict(
+                name=name,
+                cat=category,
+                ph="X",
+                ts=start / 1000,
+                dur=(time.time_ns() - start) / 1000,
+                pid=os.getpid(),
+                tid=threading.get_ident(),
+                args=dict(
+                    cpu_ms=cpu_time * 1000,
+                    peak_rss_kb=_get_peak_rss(category == "subprocess"),
+                    **{key: str(value) for key, value in argument.items()},
+                ),
+            )
+            with self._lock:
+                self.trace_event_list.append(trace_event)
+
+    def add_trace_event_sequence(self, trace_event_sequence: typing.Sequence[dict]):
+        with self._lock:
+            self.trace_event_list.extend(trace_event_sequence)
+
+    def write(self, path: str = PROFILE_PATH):
+        """Write Chrome trace file."""
+        if self.trace_event_list:
+            t0 = min(trace_event["ts"] for trace_event in self.trace_event_list)
+        else:
+            t0 = 0
+        trace_event_list = [
+            dict(trace_event, ts=trace_event["ts"] - t0)
+            for trace_event in self.trace_event_list
+        ]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(dict(traceEvents=trace_event_list), f)
+
+    def summary(self) -> str:
+        """Table with total wall time, CPU time and peak RSS of each stage."""
+        row_list = []
+        for category in ("stage", "subprocess", "entry"):
+            name_to_trace_event_list = collections.defaultdict(list)
+            for trace_event in self.trace_event_list:
+                if trace_event["cat"] == category:
+                    name_to_trace_event_list[trace_event["name"]].append(trace_event)
+            if not name_to_trace_event_list:
+                continue
+            row_list.append((category, "count", "wall [s]", "cpu [s]", "peak rss [MB]"))
+            for name, trace_event_list in sorted(
+                name_to_trace_event_list.items(),
+                key=lambda item: -sum(e["dur"] for e in item[1]),
+            ):
+                wall = sum(e["dur"] for e in trace_event_list) / 1e6
+                cpu = sum(e["args"]["cpu_ms"] for e in trace_event_list) / 1e3
+                rss = max(e["args"]["peak_rss_kb"] for e in trace_event_list) / 1024
+                row_list.append(
+                    (
+                        f"  {name}",
+                        str(len(trace_event_list)),
+                        f"{wall:.3f}",
+                        f"{cpu:.3f}",
+                        f"{rss:.1f}",
+                    )
+                )
+        if not row_list:
+            return ""
+        width_tuple = tuple(
+            max(len(row[column]) for row in row_list) for column in range(5)
+        )
+        return "\n".join(
+            "  ".join(
+                cell.ljust(width) if column == 0 else cell.rjust(width)
+                for column, (cell, width) in enumerate(zip(row, width_tuple))
+            )
+            for row in row_list
+        )
+
+
+def _get_children_cpu_time() -> float:
+    r = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return r.ru_utime + r.ru_stime
+
+
+def _get_peak_rss(children: bool = False) -> int:
+    # ru_maxrss is in kilobytes on Linux.
+    if children:
+        return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def stage(name: str, **argument):
+    """Record the enclosed code as stage of the active profiler.
+
+    **Example:**
+
+    >>> with stage("resolve_conflicts", page=3):
+    ...     clock_line.resolve_conflicts()
+    """
+    if PROFILER is None:
+        return contextlib.nullcontext()
+    return PROFILER.stage(name, **argument)
+
+
+def start() -> Profiler:
+    """Activate a new profiler (and record entries and subprocesses)."""
+    global PROFILER
+    assert PROFILER is None, "There is already an active profiler"
+
+    from mutwo import diary_interfaces
+
+    PROFILER = Profiler()
+    patch_list = []
+    for cls in (
+        diary_interfaces.DynamicEntry,
+        getattr(diary_interfaces, "ClockEntry", None),
+    ):
+        if (method := vars(cls or object).get("__call__")) is not None:
+            cls.__call__ = _profile_entry(method)
+            patch_list.append((cls, "__call__", method))
+    for function_name in ("call", "run"):
+        function = getattr(subprocess, function_name)
+        setattr(subprocess, function_name, _profile_subprocess(function))
+        patch_list.append((subprocess, function_name, function))
+    PROFILER._patch_list = patch_list
+    return PROFILER
+
+
+def stop() -> Profiler:
+    """Deactivate the active profiler and return it."""
+    global PROFILER
+    profiler, PROFILER = PROFILER, None
+    for obj, name, value in reversed(profiler._patch_list):
+        setattr(obj, name, value)
+    return profiler
+
+
+@contextlib.contextmanager
+def profile():
+    profiler = start()
+    try:
+        yield profiler
+    finally:
+        stop()
+
+
+def _profile_entry(method):
+    @functools.wraps(method)
+    def profiled_method(self, *args, **kwargs):
+        if PROFILER is None:
+            return method(self, *args, **kwargs)
+        with PROFILER.stage(self.name, category="entry"):
+            return method(self, *args, **kwargs)
+
+    return profiled_method
+
+
+def _profile_subprocess(function):
+    @functools.wraps(function)
+    def profiled_function(args, *arguments, **kwargs):
+        if PROFILER is None:
+            return function(args, *arguments, **kwargs)
+        if isinstance(args, str):
+            name = args.split(" ")[0]
+        else:
+            name = str(args[0])
+        with PROFILER.stage(os.path.basename(name), category="subprocess", args=args):
+            return function(args, *arguments, **kwargs)
+
+    return profiled_function
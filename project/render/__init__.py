@@ -1,3 +1,16 @@
 from .notation import notation
 from .midi import midi
 from .illustration import illustration
+
+
+def get_page_label(page_index_tuple) -> str:
+    """Short name of a page selection for file names, e.g. 'p5-8,12'."""
+    range_list = []
+    for page_index in sorted(page_index_tuple):
+        if range_list and range_list[-1][1] == page_index - 1:
+            range_list[-1][1] = page_index
+        else:
+            range_list.append([page_index, page_index])
+    return "p" + ",".join(
+        str(start) if start == end else f"{start}-{end}" for start, end in range_list
+    )
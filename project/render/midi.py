@@ -1,4 +1,9 @@
 import concurrent.futures
+import fractions
+import functools
+import os
+import pickle
+import zlib
 
 import numpy as np
 import ranges
@@ -6,7 +11,6 @@ import ranges
 from mutwo import clock_converters
 from mutwo import clock_interfaces
 from mutwo import core_events
-from mutwo import core_parameters
 from mutwo import midi_converters
 from mutwo import music_converters
 from mutwo import music_events
@@ -15,8 +19,25 @@ from mutwo import project_converters
 
 import project
 
-
-def midi(clock_tuple: tuple[clock_interfaces.Clock, ...]):
+# SPEED UP. should later be slowed down again :)
+TEMPO = fractions.Fraction(14, 4)
+"""Static tempo (in BPM) of the rendered midi files."""
+
+
+def midi(
+    clock_tuple: tuple[clock_interfaces.Clock, ...],
+    page_index_tuple=None,
+    instrument_name_tuple=None,
+    jobs=None,
+):
+    """Render one midi file for each instrument (and playing technique).
+
+    If only some pages are rendered, ``page_index_tuple`` needs to
+    contain the page index of each clock (it is added to the file names).
+    If ``instrument_name_tuple`` is set, only these instruments are
+    rendered. The instruments are rendered in ``jobs`` processes (by
+    default one for each CPU).
+    """
     clock2sim = clock_converters.ClockToSimultaneousEvent(
         project_converters.ClockLineToSimultaneousEvent()
     ).convert
@@ -29,20 +50,86 @@ def midi(clock_tuple: tuple[clock_interfaces.Clock, ...]):
         )
         simultaneous_event.concatenate_by_tag(clock_simultaneous_event)
 
+    if instrument_name_tuple is not None:
+        simultaneous_event[:] = [
+            event for event in simultaneous_event if event.tag in instrument_name_tuple
+        ]
+
     post_process_instruments(simultaneous_event)
-    adjust_tempo(simultaneous_event)
 
-    grace_notes_converter = music_converters.GraceNotesConverter(
+    if page_index_tuple is None:
+        suffix = ""
+    else:
+        suffix = f"_{project.render.get_page_label(page_index_tuple)}"
+
+    # The whole conversion of an instrument (playing indicators, grace
+    # notes, midi messages, file) runs in a worker process. Events are
+    # sent as compressed pickles, which are much smaller than the events.
+    argument_tuple_tuple = tuple(
+        (
+            zlib.compress(pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL), 1),
+            f"builds/midi/{project.constants.TITLE}_{event.tag}{suffix}.mid",
+        )
+        for event in simultaneous_event
+    )
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(argument_tuple_tuple))
+
+    if jobs <= 1:
+        for argument_tuple in argument_tuple_tuple:
+            _render_instrument(*argument_tuple)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        task_list = [
+            executor.submit(_render_instrument, *argument_tuple)
+            for argument_tuple in argument_tuple_tuple
+        ]
+        done, not_done = concurrent.futures.wait(
+            task_list, return_when=concurrent.futures.FIRST_EXCEPTION
+        )
+        for task in done:
+            task.result()
+
+
+def _render_instrument(data: bytes, path: str):
+    event = pickle.loads(zlib.decompress(data))
+    event = _get_grace_notes_converter()(_get_playing_indicators_converter()(event))
+    # The tempo is applied when the midi ticks are computed, so the
+    # event isn't metrized.
+    midi_converters.EventToMidiFile().convert(event, path, tempo=TEMPO)
+
+
+@functools.cache
+def _get_grace_notes_converter():
+    return music_converters.GraceNotesConverter(
         minima_grace_notes_duration_factor=0.08, maxima_grace_notes_duration_factor=0.1
     )
-    playing_indicators_converter = music_converters.PlayingIndicatorsConverter(
+
+
+def _seconds_to_beats(seconds):
+    # The events aren't metrized, so durations in seconds have
+    # to be converted to durations in beats of 'TEMPO'.
+    return seconds * TEMPO / 60
+
+
+@functools.cache
+def _get_playing_indicators_converter():
+    return music_converters.PlayingIndicatorsConverter(
         (
-            music_converters.TrillConverter(),
+            music_converters.TrillConverter(
+                trill_size=_seconds_to_beats(fractions.Fraction(1, 16))
+            ),
             music_converters.OptionalConverter(),
             music_converters.ArticulationConverter(),
             music_converters.StacattoConverter(),
-            music_converters.ArpeggioConverter(duration_for_each_attack=0.3),
-            project_converters.TremoloConverter(0.21, 1.25),
+            music_converters.ArpeggioConverter(
+                duration_for_each_attack=_seconds_to_beats(0.3)
+            ),
+            project_converters.TremoloConverter(
+                _seconds_to_beats(0.21), _seconds_to_beats(1.25)
+            ),
             project_converters.ClusterConverter(project.constants.SCALE),
             project_converters.FlageoletConverter(),
             project_converters.BendAfterConverter(),
@@ -52,32 +139,8 @@ def midi(clock_tuple: tuple[clock_interfaces.Clock, ...]):
         )
     )
 
-    event_to_midi_file = midi_converters.EventToMidiFile()
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        task_list = []
-        for event in simultaneous_event:
-            event = grace_notes_converter(playing_indicators_converter(event))
-
-            task_list.append(
-                executor.submit(
-                    event_to_midi_file.convert,
-                    event,
-                    f"builds/midi/{project.constants.TITLE}_{event.tag}.mid",
-                )
-            )
-
-        done, not_done = concurrent.futures.wait(
-            task_list, return_when=concurrent.futures.FIRST_EXCEPTION
-        )
-        for task in done:
-            task.result()
-
 
 def post_process_instruments(simultaneous_event):
-    filter_pizz = project_converters.FilterPizzicatoNoteLike()
-    filter_arco = project_converters.FilterArcoNoteLike()
-
     event_to_remove_index_list = []
     event_to_add_list = []
     for event_index, event in enumerate(simultaneous_event):
@@ -100,29 +163,11 @@ def post_process_instruments(simultaneous_event):
                         )
 
                 event_to_remove_index_list.append(event_index)
-                event_to_add_list.extend(
-                    (
-                        filter_pizz(
-                            event.set("tag", f"{event.tag}_pizz", mutate=False)
-                        ),
-                        filter_arco(
-                            event.set("tag", f"{event.tag}_arco", mutate=False)
-                        ),
-                    )
-                )
+                event_to_add_list.extend(split_pizz_arco(event))
 
             case project.constants.ORCHESTRATION.V.name:
                 event_to_remove_index_list.append(event_index)
-                event_to_add_list.extend(
-                    (
-                        filter_pizz(
-                            event.set("tag", f"{event.tag}_pizz", mutate=False)
-                        ),
-                        filter_arco(
-                            event.set("tag", f"{event.tag}_arco", mutate=False)
-                        ),
-                    )
-                )
+                event_to_add_list.extend(split_pizz_arco(event))
 
             case project.constants.ORCHESTRATION.HARP.name:
                 for seq in event:
@@ -140,16 +185,7 @@ def post_process_instruments(simultaneous_event):
                         )
 
                 event_to_remove_index_list.append(event_index)
-                event_to_add_list.extend(
-                    (
-                        filter_pizz(
-                            event.set("tag", f"{event.tag}_pizz", mutate=False)
-                        ),
-                        filter_arco(
-                            event.set("tag", f"{event.tag}_arco", mutate=False)
-                        ),
-                    )
-                )
+                event_to_add_list.extend(split_pizz_arco(event))
 
     for event_to_remove_index in reversed(event_to_remove_index_list):
         del simultaneous_event[event_to_remove_index]
@@ -157,29 +193,18 @@ def post_process_instruments(simultaneous_event):
     simultaneous_event.extend(event_to_add_list)
 
 
-def adjust_tempo(simultaneous_event):
-    import random
-
-    random.seed(10)
-    # SPEED UP. should later be slowed down again :)
-    step = core_parameters.DirectDuration(10)
-    index_count = int(simultaneous_event.duration / step) or 1
-
-    tempo_main = 14 / 4
-    # tempo_main = 30 / 4
-    derivation = 3 / 4
-
-    tempo_envelope = core_events.TempoEnvelope(
-        [
-            [
-                # step * index,
-                # core_parameters.DirectTempoPoint(random.gauss(tempo_main, derivation)),
-                d,
-                core_parameters.DirectTempoPoint(tempo_main),
-            ]
-            for d in (0, simultaneous_event.duration)
-            # for index in range(index_count)
-        ]
-    )
+def split_pizz_arco(event):
+    """Split instrument event into a pizzicato and an arco event.
+
+    The event is walked only once and both new events share all parts
+    of the event which they don't change.
+    """
+    event_tuple = _partition_pizz_arco(event)
+    for event_part, suffix in zip(event_tuple, ("pizz", "arco")):
+        event_part.tag = f"{event.tag}_{suffix}"
+    return event_tuple
+
 
-    simultaneous_event.set("tempo_envelope", tempo_envelope).metrize()
+_partition_pizz_arco = project_converters.PartitionEvent(
+    project_converters.get_contact_point, ("pizzicato", "arco")
+)
@@ -1,4 +1,6 @@
 import concurrent.futures
+import glob
+import os
 import subprocess
 import warnings
 
@@ -16,6 +18,13 @@ import project
 
 MAX_DENOMINATOR = 100000
 
+# If one of these files change, all pages need to be notated again.
+NOTATION_SOURCE_PATTERN_TUPLE = (
+    "project/render/notation.py",
+    "project/patches/*.py",
+    "etc/lilypond/*.ily",
+)
+
 
 def clock_event_to_abjad_staff_group():
     class PostProcessClockSequentialEvent(
@@ -408,7 +417,26 @@ instrument_note_like_to_pitched_note_like = (
 )
 
 
-def notation(clock_tuple, notate_item):
+def notation(
+    clock_tuple,
+    notate_item,
+    page_key_tuple=None,
+    page_index_tuple=None,
+    instrument_name_tuple=None,
+):
+    """Notate all clocks for the given instrument (or "all").
+
+    If ``page_key_tuple`` is set (one key for each clock, e.g. the
+    cache key of the clock), each page is notated to its own pdf and
+    only pages whose key changed are notated again. Afterwards the
+    pages are merged into one pdf.
+
+    If only some pages are notated, ``page_index_tuple`` needs to
+    contain the page index of each clock. Then the pdf name contains
+    the pages and it isn't merged with the poem. If
+    ``instrument_name_tuple`` is set, only parts which consist of
+    these instruments (and the percussion clock) are notated.
+    """
     # set to true if you only want score creation but not expensive notation render
     omit_notation = False
 
@@ -452,6 +480,11 @@ def notation(clock_tuple, notate_item):
         ):
             if notate_item not in ("all", name):
                 continue
+            if instrument_name_tuple is not None and not set(tag_tuple).issubset(
+                set(instrument_name_tuple)
+                | {project.constants.ORCHESTRATION.PCLOCK.name}
+            ):
+                continue
             if p := _notation(
                 name,
                 tag_to_abjad_staff_group_converter,
@@ -459,12 +492,18 @@ def notation(clock_tuple, notate_item):
                 clock_tuple,
                 executor,
                 omit_notation,
+                page_key_tuple,
+                page_index_tuple,
             ):
                 path_list.append(p)
 
     with concurrent.futures.ThreadPoolExecutor() as executor:
-        for path in path_list:
-            _score(path, executor)
+        for path, page_path_tuple in path_list:
+            if page_path_tuple:
+                _merge(page_path_tuple, path)
+            # The poem & intro are only interleaved with the complete score.
+            if page_index_tuple is None:
+                _score(path, executor)
 
 
 def _notation(
@@ -474,11 +513,25 @@ def _notation(
     clock_tuple,
     executor,
     omit_notation,
+    page_key_tuple=None,
+    page_index_tuple=None,
 ):
-    notation_path = f"builds/notations/{project.constants.TITLE}_{name}.pdf"
+    if page_index_tuple is None:
+        notation_path = f"builds/notations/{project.constants.TITLE}_{name}.pdf"
+        page_index_tuple = tuple(range(len(clock_tuple)))
+    else:
+        notation_path = (
+            f"builds/notations/{project.constants.TITLE}_{name}"
+            f"_{project.render.get_page_label(page_index_tuple)}.pdf"
+        )
+
+    if page_key_tuple is not None:
+        page_path_tuple = _get_page_path_tuple(name, page_key_tuple, page_index_tuple)
+    else:
+        page_path_tuple = None
 
     if omit_notation:
-        return notation_path
+        return notation_path, page_path_tuple
 
     print("\n\nNotate", name)
 
@@ -488,7 +541,15 @@ def _notation(
     )
 
     abjad_score_block_list = []
-    for clock in clock_tuple:
+    for clock_index, (page_index, clock) in enumerate(
+        zip(page_index_tuple, clock_tuple)
+    ):
+        if (
+            page_path_tuple
+            and page_key_tuple[clock_index] is not None
+            and os.path.exists(page_path_tuple[clock_index])
+        ):
+            continue
         for clock_line in (
             clock.main_clock_line,
             clock.start_clock_line,
@@ -500,9 +561,12 @@ def _notation(
                         clock_line.clock_event
                     )
                 )
-        abjad_score = clock_to_abjad_score.convert(
-            clock, tag_tuple=tag_tuple, ordered_tag_tuple=tag_tuple
-        )
+        with project.profiler.stage(
+            "ClockToAbjadScore.convert", notation=name, page=page_index
+        ):
+            abjad_score = clock_to_abjad_score.convert(
+                clock, tag_tuple=tag_tuple, ordered_tag_tuple=tag_tuple
+            )
 
         # We get lilypond error for harp:
         #   Interpreting music...[8][16][24]ERROR: Wrong type (expecting exact integer): ()
@@ -525,8 +589,32 @@ def _notation(
             ragged_right=False,
             ragged_last=True,
         )
-        abjad_score_block_list.append(abjad_score_block)
+        if page_path_tuple:
+            print(f"Notate {name}, page {page_index}")
+            _remove_page(name, page_index)
+            executor.submit(
+                _as_pdf,
+                _make_lilypond_file([abjad_score_block]),
+                page_path_tuple[clock_index],
+            )
+        else:
+            abjad_score_block_list.append(abjad_score_block)
+
+    if not page_path_tuple:
+        executor.submit(
+            _as_pdf,
+            _make_lilypond_file(abjad_score_block_list),
+            notation_path,
+        )
+    return notation_path, page_path_tuple
+
 
+def _as_pdf(lilypond_file, path):
+    with project.profiler.stage("abjad.persist.as_pdf", path=path):
+        abjad.persist.as_pdf(lilypond_file, path)
+
+
+def _make_lilypond_file(abjad_score_block_list):
     lilypond_file = clock_converters.AbjadScoreBlockTupleToLilyPondFile(
         system_system_basic_distance=6,
         system_system_padding=1,
@@ -554,8 +642,42 @@ def _notation(
     lilypond_file.items.insert(0, r'\include "etc/lilypond/sync.ily"')
     lilypond_file.items.insert(0, r'\include "etc/lilypond/ekme-heji.ily"')
 
-    executor.submit(abjad.persist.as_pdf, lilypond_file, notation_path)
-    return notation_path
+    return lilypond_file
+
+
+def _get_page_path_tuple(name, page_key_tuple, page_index_tuple):
+    notation_source_hash = project.cache.hash_path_tuple(
+        tuple(
+            path
+            for pattern in NOTATION_SOURCE_PATTERN_TUPLE
+            for path in glob.glob(pattern)
+        )
+    )
+    page_path_list = []
+    for page_index, page_key in zip(page_index_tuple, page_key_tuple):
+        if page_key is not None:
+            page_key = project.cache.ClockCache.make_key(
+                page_key, notation_source_hash
+            )[:16]
+        page_path_list.append(
+            f"{_get_page_path_prefix(name, page_index)}{page_key}.pdf"
+        )
+    return tuple(page_path_list)
+
+
+def _get_page_path_prefix(name, page_index):
+    return f"builds/notations/pages/{project.constants.TITLE}_{name}_{page_index}_"
+
+
+def _remove_page(name, page_index):
+    """Remove outdated pdfs of the given page."""
+    os.makedirs("builds/notations/pages", exist_ok=True)
+    for path in glob.glob(f"{_get_page_path_prefix(name, page_index)}*.pdf"):
+        os.remove(path)
+
+
+def _merge(page_path_tuple, path):
+    subprocess.call(["pdftk", *page_path_tuple, "cat", "output", path])
 
 
 def _score(path, executor):
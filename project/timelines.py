@@ -0,0 +1,226 @@
+"""Faster conflict resolution for time lines.
+
+:meth:`mutwo.timeline_interfaces.TimeLine.resolve_conflicts` compares all
+event placements with each other and starts again from the beginning
+after each resolved conflict. For dense clock lines this is roughly
+quadratic in the number of event placements (and each comparison calls
+the possibly expensive ``is_conflict`` function).
+
+:class:`ConflictDetector` only compares event placements which overlap
+in time and which share a tag (or which belong to an explicitly given
+pair of tags). Each pair is only tested once, unless one of its event
+placements took part in a resolved conflict. The conflicts are found
+and resolved in the same order as in mutwo, so (with the same
+strategies and seeds) the results are identical. The only exception
+are strategies which register new event placements: mutwo appends them
+to the already sorted time line and may therefore miss some of their
+conflicts, while here all their conflicts are found.
+"""
+
+import bisect
+import heapq
+import itertools
+import typing
+
+from mutwo import timeline_interfaces
+from mutwo import timeline_utilities
+
+TagPair = tuple[str, str]
+
+
+class ConflictDetector(object):
+    """Find conflicting event placements of a time line.
+
+    :param timeline: The time line which should be checked.
+    :type timeline: timeline_interfaces.TimeLine
+    :param is_conflict: Same as in
+        :meth:`mutwo.timeline_interfaces.TimeLine.resolve_conflicts`.
+    :param tag_pair_sequence: Pairs of different tags whose event
+        placements could also conflict. By default only event
+        placements which share a tag are tested with ``is_conflict``.
+        If ``is_conflict`` returns ``True`` for other placements too,
+        their tags need to be added here.
+    :type tag_pair_sequence: typing.Sequence[TagPair]
+
+    Strategies may unregister or register event placements and may
+    change the events of the conflicting event placements, but they
+    shouldn't move event placements in time (move them by
+    unregistering and registering them again).
+    """
+
+    def __init__(
+        self,
+        timeline: timeline_interfaces.TimeLine,
+        is_conflict: typing.Callable[
+            [timeline_interfaces.EventPlacement, timeline_interfaces.EventPlacement],
+            bool,
+        ],
+        tag_pair_sequence: typing.Sequence[TagPair] = tuple([]),
+    ):
+        self.timeline = timeline
+        self.is_conflict = is_conflict
+        self._tag_to_partner_tag_set = {}
+        for tag0, tag1 in tag_pair_sequence:
+            self._tag_to_partner_tag_set.setdefault(tag0, set([])).add(tag1)
+            self._tag_to_partner_tag_set.setdefault(tag1, set([])).add(tag0)
+
+        # id(event_placement) -> (position, event_placement)
+        self._id_to_position = {}
+        self._position_counter = itertools.count()
+        # tag -> [sorted start list, end list, prefix max end list, ep list]
+        self._tag_to_bucket = {}
+        # Heap with candidate pairs which still need to be tested.
+        self._pair_heap = []
+        self._pending_pair_set = set([])
+
+        for event_placement in timeline.event_placement_tuple:
+            self._add(event_placement)
+        for event_placement in timeline.event_placement_tuple:
+            self._push_candidate_pairs(event_placement)
+
+    def resolve_conflicts(
+        self,
+        conflict_resolution_strategy_sequence: typing.Sequence[
+            timeline_interfaces.ConflictResolutionStrategy
+        ],
+    ):
+        """Resolve all conflicts (see ``TimeLine.resolve_conflicts``).
+
+        :raises UnresolvedConflict: If none of the provided strategies
+            could solve the conflict.
+        """
+        crst = tuple(conflict_resolution_strategy_sequence)
+        while (conflict := self.pop_conflict()) is not None:
+            for s in crst:
+                if s.resolve_conflict(self.timeline, conflict):
+                    break
+            else:
+                raise timeline_utilities.UnresolvedConflict(conflict)
+            self.update(conflict)
+
+    def pop_conflict(self) -> typing.Optional[timeline_interfaces.Conflict]:
+        """Return first conflict of the time line (or ``None``)."""
+        while self._pair_heap:
+            position_pair, event_placement0, event_placement1 = heapq.heappop(
+                self._pair_heap
+            )
+            self._pending_pair_set.discard(position_pair)
+            if not (
+                self._is_alive(event_placement0) and self._is_alive(event_placement1)
+            ):
+                continue
+            if self.is_conflict(
+                event_placement0, event_placement1
+            ) and event_placement0.is_overlapping(event_placement1):
+                return timeline_interfaces.Conflict(event_placement0, event_placement1)
+        return None
+
+    def update(self, conflict: timeline_interfaces.Conflict):
+        """Update candidates after a conflict has been resolved."""
+        alive_id_set = set(map(id, self.timeline.event_placement_tuple))
+        for ep_id in tuple(self._id_to_position):
+            if ep_id not in alive_id_set:
+                del self._id_to_position[ep_id]
+
+        new_event_placement_list = []
+        for event_placement in self.timeline.event_placement_tuple:
+            if id(event_placement) not in self._id_to_position:
+                self._add(event_placement)
+                new_event_placement_list.append(event_placement)
+
+        # The events of the conflicting event placements may have
+        # changed, so all their pairs need to be tested again.
+        for event_placement in (conflict.left, conflict.right):
+            if self._is_alive(event_placement):
+                self._push_candidate_pairs(event_placement)
+        for event_placement in new_event_placement_list:
+            self._push_candidate_pairs(event_placement)
+
+    def _is_alive(self, event_placement) -> bool:
+        return (
+            position := self._id_to_position.get(id(event_placement), None)
+        ) is not None and position[1] is event_placement
+
+    def _add(self, event_placement):
+        self._id_to_position[id(event_placement)] = (
+            next(self._position_counter),
+            event_placement,
+        )
+        start, end = event_placement.min_start, event_placement.max_end
+        for tag in set(event_placement.tag_tuple):
+            try:
+                start_list, end_list, max_end_list, ep_list = self._tag_to_bucket[tag]
+            except KeyError:
+                start_list, end_list, max_end_list, ep_list = self._tag_to_bucket[
+                    tag
+                ] = ([], [], [], [])
+            index = bisect.bisect_right(start_list, start)
+            start_list.insert(index, start)
+            end_list.insert(index, end)
+            ep_list.insert(index, event_placement)
+            # Maximum end of all placements which start earlier: so
+            # we know when we can stop to search for overlaps.
+            del max_end_list[index:]
+            for e in end_list[index:]:
+                max_end_list.append(max(max_end_list[-1], e) if max_end_list else e)
+
+    def _get_partner_tag_set(self, event_placement) -> set[str]:
+        tag_set = set(event_placement.tag_tuple)
+        for tag in tuple(tag_set):
+            tag_set.update(self._tag_to_partner_tag_set.get(tag, tuple([])))
+        return tag_set
+
+    def _push_candidate_pairs(self, event_placement):
+        position = self._id_to_position[id(event_placement)][0]
+        start, end = event_placement.min_start, event_placement.max_end
+        for tag in self._get_partner_tag_set(event_placement):
+            try:
+                start_list, end_list, max_end_list, ep_list = self._tag_to_bucket[tag]
+            except KeyError:
+                continue
+            # Only placements which start before our end can overlap.
+            index = bisect.bisect_left(start_list, end)
+            # 'bisect_left' excludes placements which start at our end,
+            # but 'ranges' only treats touching ranges as disjoint if
+            # they aren't empty, so we keep them to be safe.
+            while index < len(start_list) and start_list[index] == end:
+                index += 1
+            for i in range(index - 1, -1, -1):
+                if max_end_list[i] < start:
+                    break
+                if end_list[i] < start:
+                    continue
+                partner = ep_list[i]
+                if partner is event_placement or not self._is_alive(partner):
+                    continue
+                partner_position = self._id_to_position[id(partner)][0]
+                if partner_position < position:
+                    pair = (partner, event_placement)
+                    position_pair = (partner_position, position)
+                else:
+                    pair = (event_placement, partner)
+                    position_pair = (position, partner_position)
+                if position_pair not in self._pending_pair_set:
+                    self._pending_pair_set.add(position_pair)
+                    heapq.heappush(self._pair_heap, (position_pair, *pair))
+
+
+def resolve_conflicts(
+    timeline: timeline_interfaces.TimeLine,
+    conflict_resolution_strategy_sequence: typing.Sequence[
+        timeline_interfaces.ConflictResolutionStrategy
+    ],
+    is_conflict: typing.Callable[
+        [timeline_interfaces.EventPlacement, timeline_interfaces.EventPlacement],
+        bool,
+    ],
+    tag_pair_sequence: typing.Sequence[TagPair] = tuple([]),
+):
+    """Drop-in replacement for ``TimeLine.resolve_conflicts``.
+
+    See :class:`ConflictDetector` for the additional ``tag_pair_sequence``.
+    """
+    timeline.sort()
+    ConflictDetector(timeline, is_conflict, tag_pair_sequence).resolve_conflicts(
+        conflict_resolution_strategy_sequence
+    )